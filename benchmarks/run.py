@@ -0,0 +1,303 @@
+"""
+Benchmarks of every pipeline stage, from the 90-move three-square program
+up to millions of moves, and of parameter sweeps from 1 to 10^4 sets.
+
+Each benchmark is timed best-of-N with time.perf_counter() (as timeit
+does) and then run once more under tracemalloc for its peak traced
+memory, which includes NumPy buffers. Setup work is excluded from both.
+Results can be saved as a baseline and later runs compared against it:
+
+    python -m benchmarks.run --save benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json
+
+The comparison exits with status 1 when a time or peak memory grew by
+more than --threshold. Baselines are machine specific.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from pdms_gcode.batch import product_grid, run_sweep
+from pdms_gcode.reader import parse_gcode
+from pdms_gcode.rheology import calculate_extrusion_speed, calculate_flow_rate
+from pdms_gcode.toolpath import (
+    cumulative_extrusion,
+    format_gcode,
+    format_modal,
+    generate_lattice,
+    generate_toolpath,
+    lattice_layout,
+)
+from pdms_gcode.validate import validate_toolpath
+from pdms_gcode.writer import stream_toolpath, write_gcode
+
+# Program sizes in moves; 90 is the original three-square program
+MOVES = (90, 10 ** 4, 10 ** 5, 10 ** 6, 4 * 10 ** 6)
+# Sweep sizes in parameter sets
+SETS = (1, 10, 100, 1000, 10 ** 4)
+
+# The three-square inputs of the README example
+PARAMS = dict(deltax=2.0, deltay=1.5, u1=600.0, u2=900.0, u3=1200.0, D=0.41, Gamma=50.0, n=0.4)
+R = PARAMS["D"] / 2
+V = calculate_extrusion_speed(calculate_flow_rate(PARAMS["Gamma"], PARAMS["D"], PARAMS["n"]), R)
+
+# Timing: repeat until MIN_TIME has elapsed, between MIN_REPEATS and MAX_REPEATS runs
+MIN_TIME = 0.2  # s
+MIN_REPEATS = 3
+MAX_REPEATS = 1000
+# Time differences below this are noise, whatever their ratio
+NOISE_FLOOR = 5e-4  # s
+DEFAULT_THRESHOLD = 1.25
+
+BENCHMARKS = {}
+
+
+def benchmark(kind, sizes):
+    """
+    Register `setup(size, tmp, workers)` as a benchmark over `sizes` of
+    `kind` ("moves" or "sets"). setup() does the untimed preparation, in
+    the scratch directory `tmp`, and returns the function to time.
+    """
+    def register(setup):
+        BENCHMARKS[setup.__name__] = (setup, kind, sizes)
+        return setup
+    return register
+
+
+def program(moves):
+    """
+    The three-square program for 90 moves, otherwise a lattice bed of
+    about `moves` moves.
+    """
+    if moves <= 90:
+        return generate_toolpath(PARAMS["deltax"], PARAMS["deltay"], PARAMS["u1"], PARAMS["u2"], PARAMS["u3"], R, V)
+    specimens = max(1, round(moves / 31))
+    return generate_lattice(PARAMS["deltax"], PARAMS["deltay"], [600.0, 900.0, 1200.0], R, V, specimens=specimens)
+
+
+def sweep_grid(sets):
+    """
+    The first `sets` parameter sets of a product grid around PARAMS.
+    """
+    levels = np.linspace(0.5, 1.5, 22).tolist()
+    spec = dict(PARAMS, u1=[PARAMS["u1"] * s for s in levels], u2=[PARAMS["u2"] * s for s in levels],
+                u3=[PARAMS["u3"] * s for s in levels])
+    return product_grid(spec)[:sets]
+
+
+@benchmark("moves", MOVES)
+def flow_rate(size, tmp, workers):
+    gamma = np.linspace(1.0, 1000.0, size)
+    return lambda: calculate_extrusion_speed(calculate_flow_rate(gamma, PARAMS["D"], PARAMS["n"]), R)
+
+
+@benchmark("moves", MOVES)
+def extrusion(size, tmp, workers):
+    toolpath = program(size)
+    lengths = np.concatenate(([0.0], np.hypot(np.diff(toolpath.x), np.diff(toolpath.y))))
+    return lambda: cumulative_extrusion(lengths, toolpath.f, R, V)
+
+
+@benchmark("moves", MOVES)
+def generate(size, tmp, workers):
+    return lambda: program(size)
+
+
+@benchmark("moves", MOVES[1:])
+def layout(size, tmp, workers):
+    specimens = max(1, round(size / 31))
+    return lambda: lattice_layout(PARAMS["deltax"], PARAMS["deltay"], [600.0, 900.0, 1200.0], specimens=specimens)
+
+
+@benchmark("moves", MOVES)
+def format_full(size, tmp, workers):
+    x, y, z, e, f = program(size).data
+    return lambda: format_gcode(x, y, z, e, f)
+
+
+@benchmark("moves", MOVES)
+def format_modal_words(size, tmp, workers):
+    x, y, z, e, f = program(size).data
+    return lambda: format_modal(x, y, z, e, f)
+
+
+@benchmark("moves", MOVES)
+def write(size, tmp, workers):
+    toolpath = program(size)
+    path = os.path.join(tmp, "write.gcode")
+    return lambda: write_gcode(stream_toolpath(toolpath), path)
+
+
+@benchmark("moves", MOVES)
+def parse(size, tmp, workers):
+    data = program(size).gcode().encode()
+    return lambda: parse_gcode(data)
+
+
+@benchmark("moves", MOVES)
+def validate(size, tmp, workers):
+    toolpath = program(size)
+    return lambda: validate_toolpath(toolpath, R=R, v=V)
+
+
+@benchmark("moves", MOVES[:3])
+def plot(size, tmp, workers):
+    from pdms_gcode.plotting import plot_printing_pattern
+
+    coords = program(size).coords()
+    path = os.path.join(tmp, "plot.png")
+    return lambda: plot_printing_pattern(coords, path)
+
+
+@benchmark("moves", MOVES)
+def preview(size, tmp, workers):
+    from pdms_gcode.preview import render_preview
+
+    toolpath = program(size)
+    path = os.path.join(tmp, "preview.png")
+    return lambda: render_preview(toolpath.x, toolpath.y, path, z=toolpath.z)
+
+
+@benchmark("sets", SETS)
+def sweep(size, tmp, workers):
+    # With workers > 1 the peak memory only covers the parent process
+    grid = sweep_grid(size)
+    out_dir = os.path.join(tmp, "sweep")
+    return lambda: run_sweep(grid, workers, out_dir=out_dir)
+
+
+@benchmark("sets", SETS)
+def estimate(size, tmp, workers):
+    from pdms_gcode.motion import estimate_sweep
+
+    grid = sweep_grid(size)
+    return lambda: estimate_sweep(grid)
+
+
+def measure(run, min_time=MIN_TIME):
+    """
+    Best and mean time of `run` over repeated calls after one warm-up
+    call (imports, caches), and its peak traced memory over one more.
+    """
+    run()
+    times = []
+    while len(times) < MIN_REPEATS or (sum(times) < min_time and len(times) < MAX_REPEATS):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"time": min(times), "mean": sum(times) / len(times), "repeats": len(times), "peak_bytes": peak}
+
+
+def run_benchmarks(pattern=None, max_moves=10 ** 6, max_sets=10 ** 4, workers=1, min_time=MIN_TIME):
+    """
+    Run the registered benchmarks whose name matches `pattern` (a regular
+    expression), up to `max_moves` moves and `max_sets` parameter sets.
+    Yields one result dict per benchmark and size as it completes.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (setup, kind, sizes) in BENCHMARKS.items():
+            if pattern and not re.search(pattern, name):
+                continue
+            for size in sizes:
+                if size > (max_moves if kind == "moves" else max_sets):
+                    continue
+                run = setup(size, tmp, workers)
+                yield dict(measure(run, min_time), name=name, kind=kind, size=size)
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Ratios of `results` to the `baseline` results of the same benchmark
+    and size. Returns one row per result found in the baseline, flagged
+    "regressed" when its time or peak memory grew by more than
+    `threshold` (times only beyond NOISE_FLOOR).
+    """
+    previous = {(result["name"], result["size"]): result for result in baseline}
+    rows = []
+    for result in results:
+        old = previous.get((result["name"], result["size"]))
+        if old is None:
+            continue
+        time_ratio = result["time"] / old["time"] if old["time"] > 0 else float("inf")
+        peak_ratio = result["peak_bytes"] / old["peak_bytes"] if old["peak_bytes"] > 0 else 1.0
+        slower = time_ratio > threshold and result["time"] - old["time"] > NOISE_FLOOR
+        rows.append(dict(name=result["name"], size=result["size"], time_ratio=time_ratio, peak_ratio=peak_ratio,
+                         regressed=slower or peak_ratio > threshold))
+    return rows
+
+
+def _format_size(kind, size):
+    return f"{size:>9,} {kind}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and profile the memory of every pipeline stage.")
+    parser.add_argument("-k", "--filter", metavar="PATTERN", help="only benchmarks whose name matches")
+    parser.add_argument("--max-moves", type=int, default=10 ** 6, help="largest program size (moves)")
+    parser.add_argument("--max-sets", type=int, default=10 ** 4, help="largest sweep size (parameter sets)")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="worker processes for the sweeps")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="minimum timing per benchmark (s)")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="ratio to the baseline reported as a regression")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (_, kind, sizes) in BENCHMARKS.items():
+            print(f"{name}: {', '.join(map(str, sizes))} {kind}")
+        return
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = []
+    print(f"{'benchmark':<20}{'size':>16}{'best (s)':>12}{'mean (s)':>12}{'runs':>6}{'peak (MB)':>12}")
+    for result in run_benchmarks(args.filter, args.max_moves, args.max_sets, args.workers, args.min_time):
+        results.append(result)
+        print(f"{result['name']:<20}{_format_size(result['kind'], result['size']):>16}{result['time']:>12.5f}"
+              f"{result['mean']:>12.5f}{result['repeats']:>6}{result['peak_bytes'] / 2 ** 20:>12.2f}", flush=True)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "numpy": np.__version__,
+                "machine": platform.platform(),
+                "cpus": os.cpu_count(),
+                "results": results,
+            }, f, indent=1)
+        print(f"Baseline saved to {args.save}")
+
+    if baseline is not None:
+        rows = compare(results, baseline["results"], args.threshold)
+        print(f"\nAgainst {args.compare} ({baseline.get('machine', 'unknown machine')}):")
+        for row in rows:
+            flag = "  REGRESSED" if row["regressed"] else ""
+            print(f"{row['name']:<20}{row['size']:>10,}  time x{row['time_ratio']:.2f}  "
+                  f"peak x{row['peak_ratio']:.2f}{flag}")
+        regressed = sum(row["regressed"] for row in rows)
+        print(f"{regressed} of {len(rows)} regressed beyond x{args.threshold:g}")
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+from .incremental import IncrementalProgram, sweep_speed
+from .reader import parse_gcode, read_gcode
+from .rheology import (
+    MATERIALS,
+    MODELS,
+    calculate_extrusion_speed,
+    calculate_flow_rate,
+    carreau_flow_rate,
+    flow_rate,
+    herschel_bulkley_flow_rate,
+    material_flow_rate,
+    register_material,
+)
+from .toolpath import (
+    Toolpath,
+    build_toolpath,
+    collinear_mask,
+    calculate_extrusion,
+    cumulative_extrusion,
+    extrusion_column,
+    format_modal,
+    lattice_blocks,
+    lattice_layout,
+    format_gcode,
+    generate_gcode,
+    generate_lattice,
+    generate_toolpath,
+    relative_extrusion,
+    segment_lengths,
+    serpentine,
+    three_square_blocks,
+    three_square_layout,
+)
+from .travel import nearest_neighbour, plan_travel, two_opt
+from .writer import stream_gcode, stream_toolpath, write_gcode
@@ -0,0 +1,237 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .rheology import calculate_extrusion_speed, calculate_flow_rate
+from .toolpath import generate_gcode
+from .writer import write_gcode
+
+PARAMETERS = ("deltax", "deltay", "u1", "u2", "u3", "D", "Gamma", "n")
+
+
+def product_grid(spec):
+    """
+    Expand a Cartesian product spec into parameter sets.
+    Each value in `spec` is either a list of levels or a single value.
+    """
+    missing = [name for name in PARAMETERS if name not in spec]
+    if missing:
+        raise ValueError(f"Parameter grid is missing {', '.join(missing)}")
+    levels = [spec[name] if isinstance(spec[name], (list, tuple)) else [spec[name]] for name in PARAMETERS]
+    return [dict(zip(PARAMETERS, map(float, combo))) for combo in itertools.product(*levels)]
+
+
+def load_grid(path):
+    """
+    Read parameter sets from a CSV file (one set per row) or a JSON file
+    holding either a list of sets or a Cartesian product spec.
+    """
+    if path.lower().endswith(".json"):
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return product_grid(data)
+        rows = data
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    grid = []
+    for i, row in enumerate(rows):
+        missing = [name for name in PARAMETERS if name not in row]
+        if missing:
+            raise ValueError(f"Parameter set {i} is missing {', '.join(missing)}")
+        grid.append({name: float(row[name]) for name in PARAMETERS})
+    return grid
+
+
+def run_one(params):
+    """
+    Flow rate, extrusion speed and G-code for one parameter set.
+    """
+    R = params["D"] / 2
+    Q = calculate_flow_rate(params["Gamma"], params["D"], params["n"])
+    v = calculate_extrusion_speed(Q, R)
+    gcode, _ = generate_gcode(
+        params["deltax"], params["deltay"], params["u1"], params["u2"], params["u3"], R, v
+    )
+    return Q, v, gcode
+
+
+def _run_chunk(start, chunk, out_dir, cache_dir=None, preview=None):
+    """
+    Work unit for a pool worker: a contiguous slice of the grid.
+    Programs are written to `out_dir` when given, so only the small
+    summary travels back to the parent process. With `cache_dir` they are
+    looked up in (or added to) the program cache and linked into
+    `out_dir`, together with their `preview` image when one is asked for.
+    """
+    if cache_dir is not None:
+        return _cached_chunk(start, chunk, out_dir, cache_dir, preview)
+    results = []
+    for index, params in enumerate(chunk, start):
+        Q, v, gcode = run_one(params)
+        result = dict(params, index=index, Q=Q, v=v)
+        if out_dir is None:
+            result["gcode"] = gcode
+        else:
+            path = os.path.join(out_dir, f"program_{index:06d}.gcode")
+            write_gcode((gcode,), path)
+            result["path"] = path
+        results.append(result)
+    return results
+
+
+def _profiled_chunk(start, chunk, profile_dir, memory, cprofile, *args):
+    """
+    _run_chunk() with stage profiling; the report (and cProfile stats) of
+    the chunk are written to `profile_dir` for aggregate() to merge.
+    """
+    from .profiling import profiled
+
+    name = os.path.join(profile_dir, f"chunk_{start:06d}")
+    with profiled(f"{name}.json", memory, f"{name}.prof" if cprofile else None):
+        return _run_chunk(start, chunk, *args)
+
+
+def _cached_chunk(start, chunk, out_dir, cache_dir, preview):
+    from .cache import cached_program, export, program_path
+
+    results = []
+    for index, params in enumerate(chunk, start):
+        entry = cached_program(params, cache_dir, preview)
+        result = dict(params, index=index, Q=entry["Q"], v=entry["v"], cached=entry["hit"])
+        if out_dir is None:
+            with open(program_path(entry)) as f:
+                result["gcode"] = f.read()
+        else:
+            path = os.path.join(out_dir, f"program_{index:06d}.gcode")
+            export(program_path(entry), path)
+            result["path"] = path
+            if preview:
+                export(entry["preview"], os.path.join(out_dir, f"program_{index:06d}.png"))
+        results.append(result)
+    return results
+
+
+def map_chunks(work, grid, workers=None, chunksize=None, *args):
+    """
+    Run `work(start, chunk, *args)` over contiguous chunks of `grid` on a
+    process pool and concatenate the returned lists in grid order.
+    Returns the results and the number of grid entries per second.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        # A few chunks per worker keeps the pool busy without paying
+        # inter-process overhead for every program
+        chunksize = max(1, len(grid) // (workers * 4))
+    chunks = [(i, grid[i:i + chunksize]) for i in range(0, len(grid), chunksize)]
+
+    start = time.perf_counter()
+    results = []
+    if workers == 1:
+        for i, chunk in chunks:
+            results.extend(work(i, chunk, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(work, i, chunk, *args) for i, chunk in chunks]
+            for future in futures:
+                results.extend(future.result())
+    elapsed = time.perf_counter() - start
+    throughput = len(results) / elapsed if elapsed > 0 else float("inf")
+    return results, throughput
+
+
+def run_sweep(grid, workers=None, chunksize=None, out_dir=None, cache_dir=None, preview=None,
+              max_cache_bytes=None, profile_dir=None, memory=False, cprofile=False):
+    """
+    Generate one program per parameter set across a process pool.
+    With `cache_dir` programs (and `preview` images) are served from the
+    content-addressed program cache, generating only the missing ones,
+    and the cache is trimmed to `max_cache_bytes` afterwards.
+    With `profile_dir` every chunk is profiled stage by stage (see
+    profiling.Profiler; `memory` adds peak memory, `cprofile` cProfile
+    stats) and the chunk reports are merged into report.json there.
+    Returns the per-set results (in grid order) and the throughput in
+    programs per second.
+    """
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    if profile_dir is None:
+        results = map_chunks(_run_chunk, grid, workers, chunksize, out_dir, cache_dir, preview)
+    else:
+        from .profiling import aggregate, clear_reports
+
+        os.makedirs(profile_dir, exist_ok=True)
+        clear_reports(profile_dir)
+        results = map_chunks(
+            _profiled_chunk, grid, workers, chunksize, profile_dir, memory, cprofile, out_dir, cache_dir, preview
+        )
+        aggregate(profile_dir)
+    if cache_dir is not None:
+        from .cache import MAX_CACHE_BYTES, evict
+        evict(cache_dir, MAX_CACHE_BYTES if max_cache_bytes is None else max_cache_bytes)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate G-code for every set in a parameter grid.")
+    parser.add_argument("grid", help="CSV or JSON parameter grid")
+    parser.add_argument("-o", "--out-dir", default="sweep_output", help="directory for the generated programs")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=None, help="parameter sets per work unit")
+    parser.add_argument("--estimate", action="store_true", help="add estimated print time and volume to the summary")
+    parser.add_argument("--preview", choices=("layer", "feed"), help="also render a PNG preview per program")
+    parser.add_argument("--cache", nargs="?", const="default", metavar="DIR",
+                        help="reuse programs from a cache directory (default: ~/.cache/pdms_gcode/programs)")
+    parser.add_argument("--cache-size", type=float, default=1024, help="cache size limit (MB)")
+    parser.add_argument("--profile", metavar="DIR", help="write per-stage profiling reports to DIR")
+    parser.add_argument("--trace-memory", action="store_true", help="add peak memory per stage to the profile")
+    parser.add_argument("--cprofile", action="store_true", help="add cProfile stats per chunk to the profile")
+    args = parser.parse_args(argv)
+
+    grid = load_grid(args.grid)
+    cache_dir = None
+    if args.cache:
+        from .cache import DEFAULT_CACHE_DIR
+        cache_dir = DEFAULT_CACHE_DIR if args.cache == "default" else args.cache
+    results, throughput = run_sweep(
+        grid, args.workers, args.chunksize, args.out_dir, cache_dir, args.preview, int(args.cache_size * 2 ** 20),
+        args.profile, args.trace_memory, args.cprofile,
+    )
+
+    fields = ("index",) + PARAMETERS + ("Q", "v", "path")
+    if cache_dir:
+        fields += ("cached",)
+    if args.estimate:
+        from .motion import estimate_sweep
+        for result, estimate in zip(results, estimate_sweep(grid)):
+            result.update(time=estimate["time"], extruded_volume=estimate["extruded_volume"])
+        fields += ("time", "extruded_volume")
+
+    with open(os.path.join(args.out_dir, "summary.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(results)
+
+    print(f"Generated {len(results)} programs in {args.out_dir}")
+    print(f"Throughput= {throughput:.1f} programs/s")
+    if cache_dir:
+        print(f"Cache hits= {sum(result['cached'] for result in results)} of {len(results)} ({cache_dir})")
+    if args.profile:
+        from .profiling import format_report
+        with open(os.path.join(args.profile, "report.json")) as f:
+            print(format_report(json.load(f)))
+        print(f"Profile saved to {os.path.join(args.profile, 'report.json')}")
+
+    if args.preview and not cache_dir:
+        from .preview import render_previews
+        _, throughput = render_previews(grid, args.out_dir, args.preview, args.workers, args.chunksize)
+        print(f"Preview throughput= {throughput:.1f} images/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from .profiling import count_bytes, stage
+from .rheology import calculate_extrusion_speed, calculate_flow_rate
+from .toolpath import GENERATOR_VERSION, Toolpath, generate_toolpath
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pdms_gcode", "programs")
+
+# Total size of the cached entries before the least recently used are evicted
+MAX_CACHE_BYTES = 1 << 30
+
+KEY_PARAMETERS = ("deltax", "deltay", "u1", "u2", "u3", "D", "Gamma", "n")
+
+
+def program_key(params):
+    """
+    Content address of a parameter set: a hash of every generator input
+    and GENERATOR_VERSION. Values are rounded so sets parsed from
+    different sources share an entry.
+    """
+    values = tuple(round(float(params[name]), 9) for name in KEY_PARAMETERS)
+    return hashlib.sha1(repr((GENERATOR_VERSION,) + values).encode()).hexdigest()
+
+
+def entry_dir(key, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Directory of an entry, sharded by the first two hex digits of its key.
+    """
+    return os.path.join(cache_dir, key[:2], key[2:])
+
+
+@stage("cache_store")
+def _store(params, path):
+    """
+    Generate an entry into `path`: program.gcode, the toolpath columns as
+    toolpath.npy (memory-mappable), its square offsets and meta.json.
+    """
+    R = params["D"] / 2
+    Q = calculate_flow_rate(params["Gamma"], params["D"], params["n"])
+    v = calculate_extrusion_speed(Q, R)
+    toolpath = generate_toolpath(params["deltax"], params["deltay"], params["u1"], params["u2"], params["u3"], R, v)
+    os.makedirs(path)
+    with open(os.path.join(path, "program.gcode"), "w") as f:
+        f.write(toolpath.gcode())
+    np.save(os.path.join(path, "toolpath.npy"), toolpath.data)
+    np.save(os.path.join(path, "squares.npy"), toolpath.squares)
+    meta = {
+        "params": {name: float(params[name]) for name in KEY_PARAMETERS},
+        "version": GENERATOR_VERSION,
+        "Q": float(Q),
+        "v": float(v),
+        "stats": toolpath.stats(),
+    }
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    count_bytes(sum(entry.stat().st_size for entry in os.scandir(path)))
+    return meta
+
+
+def cached_program(params, cache_dir=DEFAULT_CACHE_DIR, preview=None):
+    """
+    The cache entry of a parameter set, generated on a miss. Entries are
+    written to a temporary directory and renamed into place, so
+    concurrent workers never see a partial entry. With `preview`
+    ("layer" or "feed") a PNG preview coloured that way is added.
+
+    Returns the entry metadata (parameters, Q, v, toolpath stats) with its
+    "key", "dir" and whether it was a "hit".
+    """
+    key = program_key(params)
+    path = entry_dir(key, cache_dir)
+    meta_path = os.path.join(path, "meta.json")
+    hit = os.path.exists(meta_path)
+    if hit:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        # Reads refresh the entry for LRU eviction
+        os.utime(meta_path)
+    else:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        meta = _store(params, tmp)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Another worker stored the same entry first
+            shutil.rmtree(tmp, ignore_errors=True)
+    meta.update(key=key, dir=path, hit=hit)
+    if preview:
+        image = os.path.join(path, f"preview_{preview}.png")
+        if not os.path.exists(image):
+            from .preview import render_preview
+
+            toolpath = load_toolpath(meta)
+            tmp = f"{image}.{os.getpid()}.tmp.png"
+            render_preview(toolpath.x, toolpath.y, tmp, z=toolpath.z, f=toolpath.f, color_by=preview)
+            os.replace(tmp, image)
+        meta["preview"] = image
+    return meta
+
+
+def load_toolpath(entry, mmap=True):
+    """
+    Toolpath of a cache entry, memory-mapped read-only unless `mmap` is
+    False.
+    """
+    data = np.load(os.path.join(entry["dir"], "toolpath.npy"), mmap_mode="r" if mmap else None)
+    return Toolpath(data, np.load(os.path.join(entry["dir"], "squares.npy")))
+
+
+def program_path(entry):
+    """
+    Path of the G-code program of a cache entry.
+    """
+    return os.path.join(entry["dir"], "program.gcode")
+
+
+@stage("cache_export")
+def export(source, dest):
+    """
+    Copy a cached file to `dest`. Copies rather than links, so editing an
+    exported program can never alter the cache.
+    """
+    shutil.copyfile(source, dest)
+    count_bytes(os.path.getsize(dest))
+
+
+def evict(cache_dir=DEFAULT_CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """
+    Remove the least recently used entries, by the modification time of
+    their meta.json, until the cache holds at most `max_bytes`. Returns
+    the number of bytes freed.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    entries = []
+    for shard in os.scandir(cache_dir):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            meta = os.path.join(entry.path, "meta.json")
+            # A writer's <key>.<pid>.tmp directory is not an entry until renamed
+            if not entry.is_dir() or entry.name.endswith(".tmp") or not os.path.exists(meta):
+                continue
+            size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+            entries.append((os.path.getmtime(meta), size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    freed = 0
+    for _, size, path in sorted(entries):
+        if total - freed <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        freed += size
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass  # shard still holds other entries
+    return freed
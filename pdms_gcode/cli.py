@@ -0,0 +1,210 @@
+import argparse
+import sys
+
+from .motion import DEFAULT_ACCELERATION, DEFAULT_JUNCTION_DEVIATION, estimate_print
+from .rheology import calculate_extrusion_speed, calculate_flow_rate
+from .toolpath import AXES, generate_lattice, generate_toolpath, lattice_blocks, lattice_layout, three_square_blocks
+from .travel import DEFAULT_RETRACT, DEFAULT_TRAVEL_FEED, plan_travel
+from .writer import stream_gcode, stream_toolpath, write_gcode
+
+DEFAULT_OUTPUT = "generated_gcode_with_visualization.gcode"
+
+# Prompts used when an input is missing and the CLI is attached to a terminal
+PROMPTS = {
+    "deltax": "Enter the value of deltax (in mm): ",
+    "deltay": "Enter the value of deltay (in mm): ",
+    "u1": "Enter the nozzle speed (mm/min) for squares 123: ",
+    "u2": "Enter the nozzle speed (mm/min) for squares 456: ",
+    "u3": "Enter the nozzle speed (mm/min) for squares 789: ",
+    "D": "Enter the nozzle diameter (mm): ",
+    "Gamma": "Enter the shear rate (1/s): ",
+    "n": "Enter the power law index (n): ",
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pdms-gcode",
+        description="Generate the three-square PDMS lattice G-code, or a bed of specimens with --speeds.",
+    )
+    parser.add_argument("--deltax", type=float, help="X spacing of the lattice (mm)")
+    parser.add_argument("--deltay", type=float, help="Y spacing of the lattice (mm)")
+    parser.add_argument("--u1", type=float, help="nozzle speed for squares 123 (mm/min)")
+    parser.add_argument("--u2", type=float, help="nozzle speed for squares 456 (mm/min)")
+    parser.add_argument("--u3", type=float, help="nozzle speed for squares 789 (mm/min)")
+    parser.add_argument("-D", "--diameter", dest="D", type=float, help="nozzle diameter (mm)")
+    parser.add_argument("--gamma", dest="Gamma", type=float, help="shear rate (1/s)")
+    parser.add_argument("-n", "--power-law-index", dest="n", type=float, help="power-law index")
+    lattice = parser.add_argument_group("lattice", "print a bed of specimens instead of the three squares")
+    lattice.add_argument("--speeds", type=float, nargs="+", help="nozzle speed per specimen (mm/min), repeated as needed")
+    lattice.add_argument("--specimens", type=int, help="number of specimens (default: one per speed)")
+    lattice.add_argument("--columns", type=int, help="specimens per bed row (default: all in one row)")
+    lattice.add_argument("--rows", type=int, default=14, help="serpentine rows per specimen")
+    lattice.add_argument("--layers", type=int, default=3, help="Z bands per specimen")
+    lattice.add_argument("--layer-height", type=float, default=2.0, help="Z step between bands (mm)")
+    lattice.add_argument("--spacing", type=float, nargs=2, default=(20.0, 20.0), metavar=("X", "Y"),
+                         help="gap between specimens (mm)")
+    lattice.add_argument("--plan-travel", action="store_true",
+                         help="reorder specimens to shorten travel, joined by retracted G0 moves")
+    lattice.add_argument("--retract", type=float, default=DEFAULT_RETRACT, help="retraction before travel (E units)")
+    lattice.add_argument("--travel-feed", type=float, default=DEFAULT_TRAVEL_FEED, help="G0 travel feed rate (mm/min)")
+    parser.add_argument(
+        "-o", "--output", default=DEFAULT_OUTPUT,
+        help="G-code file, or - for stdout; {key} is replaced with the program's cache key",
+    )
+    parser.add_argument("--cache", nargs="?", const="default", metavar="DIR",
+                        help="serve the three-square program from a cache directory (default: ~/.cache/pdms_gcode/programs)")
+    parser.add_argument("--cache-size", type=float, default=1024, help="cache size limit (MB), trimmed after a miss")
+    parser.add_argument("--modal", action="store_true", help="omit words that did not change since the previous line")
+    parser.add_argument("--relative", action="store_true", help="relative extrusion (M83) with per-move E")
+    parser.add_argument("--merge", action="store_true", help="merge collinear moves with equal Z, feed and flow")
+    parser.add_argument(
+        "--precision", metavar="AXIS=DIGITS", action="append", default=[],
+        help="decimal places for an axis in modal output, e.g. X=2 (repeatable)",
+    )
+    parser.add_argument("--plot", metavar="PATH", help="save the printing pattern to an image file")
+    parser.add_argument("--color-by", choices=("layer", "feed"), default="layer", help="colouring of the saved preview")
+    parser.add_argument("--show", action="store_true", help="open the printing pattern in a window")
+    parser.add_argument("--estimate", action="store_true", help="add estimated print time and volume to the summary")
+    parser.add_argument("--acceleration", type=float, default=DEFAULT_ACCELERATION, help="printer acceleration (mm/s^2)")
+    parser.add_argument(
+        "--junction-deviation", type=float, default=DEFAULT_JUNCTION_DEVIATION, help="printer junction deviation (mm)"
+    )
+    parser.add_argument("--profile", metavar="PATH", help="write a per-stage profiling report (JSON)")
+    parser.add_argument("--trace-memory", action="store_true", help="add peak memory per stage to the profile")
+    parser.add_argument("--cprofile", metavar="PATH", help="write cProfile stats of the run")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print the input summary")
+    return parser
+
+
+def _lattice_options(args):
+    return dict(
+        specimens=args.specimens, columns=args.columns, rows=args.rows, layers=args.layers,
+        layer_height=args.layer_height, spacing=tuple(args.spacing), travel_feed=args.travel_feed,
+    )
+
+
+def _blocks(args):
+    if args.speeds:
+        return lattice_blocks(args.deltax, args.deltay, args.speeds, **_lattice_options(args))
+    return three_square_blocks(args.deltax, args.deltay, args.u1, args.u2, args.u3)
+
+
+def _toolpath(args, R, v):
+    if args.plan_travel:
+        layout = lattice_layout(args.deltax, args.deltay, args.speeds, **_lattice_options(args))
+        return plan_travel(layout, R, v, retract=args.retract, travel_feed=args.travel_feed)
+    if args.speeds:
+        return generate_lattice(args.deltax, args.deltay, args.speeds, R, v, **_lattice_options(args))
+    return generate_toolpath(args.deltax, args.deltay, args.u1, args.u2, args.u3, R, v)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.plan_travel and not args.speeds:
+        parser.error("--plan-travel needs a bed of specimens (--speeds)")
+    for name in ("specimens", "columns"):
+        if getattr(args, name) is not None and getattr(args, name) < 1:
+            parser.error(f"--{name} must be at least 1")
+    prompts = [name for name in PROMPTS if not (args.speeds and name in ("u1", "u2", "u3"))]
+    missing = [name for name in prompts if getattr(args, name) is None]
+    if missing and not sys.stdin.isatty():
+        parser.error(f"missing inputs: {', '.join(missing)}")
+    for name in missing:
+        setattr(args, name, float(input(PROMPTS[name])))
+
+    precision = {}
+    for item in args.precision:
+        axis, _, digits = item.partition("=")
+        if axis.upper() not in AXES or not digits.isdigit():
+            parser.error(f"invalid --precision {item!r}, expected AXIS=DIGITS with AXIS one of {' '.join(AXES)}")
+        precision[axis.upper()] = int(digits)
+
+    if not (args.profile or args.cprofile):
+        return _run(parser, args, precision)
+    from .profiling import format_report, profiled
+    with profiled(args.profile, args.trace_memory, args.cprofile) as profiler:
+        _run(parser, args, precision)
+    print(format_report(profiler.report()), file=sys.stderr)
+
+
+def _run(parser, args, precision):
+    R = args.D / 2
+    # Calculate the flow rate (Q) and the extrusion speed (v)
+    Q = calculate_flow_rate(args.Gamma, args.D, args.n)
+    v = calculate_extrusion_speed(Q, R)
+
+    if "{key}" in args.output or args.cache:
+        if args.speeds:
+            parser.error("--cache and {key} apply to the three-square program, not to --speeds")
+        from .cache import DEFAULT_CACHE_DIR, cached_program, evict, export, load_toolpath, program_key, program_path
+        params = {name: getattr(args, name) for name in PROMPTS}
+        args.output = args.output.replace("{key}", program_key(params))
+
+    to_stdout = args.output == "-"
+    options = dict(modal=args.modal, precision=precision, relative=args.relative, merge=args.merge)
+    entry = None
+    toolpath = None
+    if args.cache:
+        cache_dir = DEFAULT_CACHE_DIR if args.cache == "default" else args.cache
+        entry = cached_program(params, cache_dir)
+    if entry and not (args.modal or args.relative or args.merge or precision) and not to_stdout:
+        # The cached program is the default format; hand it over as is
+        export(program_path(entry), args.output)
+    else:
+        if entry:
+            toolpath = load_toolpath(entry)
+            chunks = stream_toolpath(toolpath, **options)
+        elif args.plan_travel:
+            toolpath = _toolpath(args, R, v)
+            chunks = stream_toolpath(toolpath, **options)
+        else:
+            chunks = stream_gcode(_blocks(args), R, v, **options)
+        write_gcode(chunks, sys.stdout if to_stdout else args.output)
+    if to_stdout:
+        sys.stdout.write("\n")
+
+    # The whole toolpath is only built for the estimate and the plots, once
+    if toolpath is None and ((args.estimate and not args.quiet) or args.plot or args.show):
+        toolpath = load_toolpath(entry) if entry else _toolpath(args, R, v)
+
+    if not args.quiet:
+        out = sys.stderr if to_stdout else sys.stdout
+        print("\n### calculated and Input Values ###", file=out)
+        print(f"deltax= {args.deltax} mm", file=out)
+        print(f"deltay= {args.deltay} mm", file=out)
+        if args.speeds:
+            print(f"Specimen speeds= {' '.join(f'{u:g}' for u in args.speeds)} mm/min", file=out)
+        else:
+            print(f"u123 (nozzle speed at squares #123)= {args.u1} mm/min", file=out)
+            print(f"u456 (nozzle speed for squares #456)= {args.u2} mm/min", file=out)
+            print(f"u789 (nozzle speed for squares #789)= {args.u3} mm/min", file=out)
+        print(f"Extrusion speed (v)= {v:.5f} mm/min", file=out)
+        print(f"Nozzle diameter (D)= {args.D:.5f} mm", file=out)
+        print(f"Shear rate= {args.Gamma:.5f} 1/s", file=out)
+        if args.estimate:
+            estimate = estimate_print(toolpath, Q, args.acceleration, args.junction_deviation)
+            print(f"Estimated print time= {estimate['time']:.1f} s (feed rate only: {estimate['naive_time']:.1f} s)",
+                  file=out)
+            print(f"Extruded volume= {estimate['extruded_volume']:.3f} mm^3", file=out)
+        if not to_stdout:
+            print(f"\nG-code saved to {args.output}", file=out)
+        if entry:
+            print(f"Cache {'hit' if entry['hit'] else 'miss'}: {entry['dir']}", file=out)
+
+    if args.plot:
+        from .preview import render_preview
+        render_preview(toolpath.x, toolpath.y, args.plot, z=toolpath.z, f=toolpath.f, color_by=args.color_by)
+    if args.show:
+        from .plotting import plot_printing_pattern
+        plot_printing_pattern(toolpath.coords())
+
+    if entry and not entry["hit"]:
+        # Trim the cache once the new entry has been used
+        evict(cache_dir, int(args.cache_size * 2 ** 20))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import argparse
+import time
+
+import numpy as np
+
+from .cli import DEFAULT_OUTPUT
+from .incremental import IncrementalProgram
+from .rheology import calculate_extrusion_speed, calculate_flow_rate
+
+# Slider per input: name, label, range and value format (plain, since
+# the default formatter's mathtext is slow to lay out on every update)
+SLIDERS = (
+    ("deltax", "deltax (mm)", 0.5, 10.0, "%.2f"),
+    ("deltay", "deltay (mm)", 0.5, 10.0, "%.2f"),
+    ("u1", "u123 (mm/min)", 60.0, 3000.0, "%.0f"),
+    ("u2", "u456 (mm/min)", 60.0, 3000.0, "%.0f"),
+    ("u3", "u789 (mm/min)", 60.0, 3000.0, "%.0f"),
+    ("D", "D (mm)", 0.1, 2.0, "%.3f"),
+    ("Gamma", "shear rate (1/s)", 1.0, 500.0, "%.1f"),
+    ("n", "power-law n", 0.1, 1.0, "%.3f"),
+)
+
+# The inputs of the README example
+DEFAULTS = dict(deltax=2.0, deltay=1.5, u1=600.0, u2=900.0, u3=1200.0, D=0.41, Gamma=50.0, n=0.4)
+
+# Readout lines; only their values are redrawn on updates
+READOUT = ("E squares 123", "E squares 456", "E squares 789", "E total", "v (mm/min)", "Q (mm^3/min)")
+
+GEOMETRY = ("deltax", "deltay")
+RHEOLOGY = ("D", "Gamma", "n")
+
+
+class Explorer:
+    """
+    Sliders on the inputs of the three-square program with a live
+    preview, E total per square and extrusion speed.
+
+    Moving a slider updates the IncrementalProgram, so only the squares
+    that depend on the input are recomputed, and redraws by blitting: the
+    preview lines, the readout and the sliders are animated artists drawn
+    over backgrounds saved at the last full draw, and only the regions
+    whose artists changed are restored and redrawn (speeds and rheology
+    leave the preview alone). A full draw only happens when the path
+    outgrows, or shrinks well inside, the current axis limits.
+
+    `fig` defaults to a new pyplot figure; pass a Figure on an Agg canvas
+    to drive the explorer off-screen. Press "w" to write the current
+    program to `output`.
+    """
+
+    def __init__(self, params=None, output=DEFAULT_OUTPUT, fig=None):
+        from matplotlib.widgets import Slider
+
+        if fig is None:
+            import matplotlib.pyplot as plt
+            fig = plt.figure(figsize=(10, 7))
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.params = dict(DEFAULTS, **(params or {}))
+        self.output = output
+        self.last_redraw = None
+        self.message = ""
+        R, v = self._rheology()
+        p = self.params
+        self.program = IncrementalProgram(p["deltax"], p["deltay"], p["u1"], p["u2"], p["u3"], R, v)
+
+        self.ax = fig.add_axes([0.08, 0.45, 0.58, 0.5])
+        self.ax.set_title("2D Printing Pattern")
+        self.ax.set_xlabel("X (mm)")
+        self.ax.set_ylabel("Y (mm)")
+        self.ax.grid(True)
+        self.lines = [
+            self.ax.plot([], [], marker="o", markersize=3, linestyle="-", label=f"squares {label}", animated=True)[0]
+            for label in ("123", "456", "789")
+        ]
+        self.ax.legend(handles=self.lines, loc="upper right", fontsize="small")
+        self.info_ax = fig.add_axes([0.7, 0.45, 0.28, 0.5])
+        self.info_ax.set_axis_off()
+        self.values = []
+        for i, label in enumerate(READOUT):
+            self.info_ax.text(0.0, 1.0 - 0.08 * i, f"{label}=", va="top")
+            self.values.append(self.info_ax.text(0.6, 1.0 - 0.08 * i, "", va="top", animated=True))
+        self.info = self.info_ax.text(0.0, 0.4, "", va="top", fontsize="small", animated=True)
+
+        self.sliders = {}
+        for i, (name, label, lo, hi, fmt) in enumerate(SLIDERS):
+            slider = Slider(
+                fig.add_axes([0.2, 0.36 - i * 0.042, 0.45, 0.03]), label, lo, hi, valinit=p[name], valfmt=fmt
+            )
+            # Redrawn by blitting instead of a full draw_idle()
+            slider.drawon = False
+            for artist in (slider.poly, slider.valtext, getattr(slider, "_handle", None)):
+                if artist is not None:
+                    artist.set_animated(True)
+            slider.on_changed(lambda value, name=name: self.set(name, value))
+            self.sliders[name] = slider
+
+        self._backgrounds = {}
+        self._set_lines()
+        self._rescale()
+        self._set_info()
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.canvas.mpl_connect("key_press_event", self._on_key)
+
+    def _rheology(self):
+        p = self.params
+        R = p["D"] / 2
+        Q = calculate_flow_rate(p["Gamma"], p["D"], p["n"])
+        return R, calculate_extrusion_speed(Q, R)
+
+    def _set_lines(self):
+        for line, block in zip(self.lines, self.program.blocks):
+            line.set_data(block[0], block[1])
+
+    def _rescale(self):
+        """
+        Fit the axis limits to the path, with headroom so that small
+        changes stay inside them. Returns whether the limits changed.
+        """
+        x = np.concatenate([block[0] for block in self.program.blocks])
+        y = np.concatenate([block[1] for block in self.program.blocks])
+        (x0, x1), (y0, y1) = self.ax.get_xlim(), self.ax.get_ylim()
+        inside = x.min() >= x0 and x.max() <= x1 and y.min() >= y0 and y.max() <= y1
+        if inside and np.ptp(x) > 0.35 * (x1 - x0) and np.ptp(y) > 0.35 * (y1 - y0):
+            return False
+        mx, my = 0.4 * np.ptp(x) + 1, 0.4 * np.ptp(y) + 1
+        self.ax.set_xlim(x.min() - mx, x.max() + mx)
+        self.ax.set_ylim(y.min() - my, y.max() + my)
+        return True
+
+    def _set_info(self):
+        p = self.params
+        ends = np.asarray(self.program.ends)
+        Q = calculate_flow_rate(p["Gamma"], p["D"], p["n"])
+        readout = list(np.diff(ends, prepend=0.0)) + [ends[-1], self.program.params["v"], Q]
+        for text, value in zip(self.values, readout):
+            text.set_text(f"{value:.5f}")
+        self.info.set_text(self.message)
+
+    def _regions(self):
+        """
+        Blit regions: the preview, the readout and one per slider (from
+        its track to the right edge of the figure, so the value text is
+        included), with the animated artists drawn in each.
+        """
+        from matplotlib.transforms import Bbox
+
+        right = self.fig.bbox.x1
+        regions = {"preview": (self.ax.bbox, self.lines), "info": (self.info_ax.bbox, self.values + [self.info])}
+        for name, slider in self.sliders.items():
+            box = slider.ax.bbox
+            artists = [a for a in (slider.poly, getattr(slider, "_handle", None), slider.valtext) if a is not None]
+            regions[name] = (Bbox.from_extents(box.x0, box.y0, right, box.y1), artists)
+        return regions
+
+    def _on_draw(self, event):
+        # A full draw skips animated artists: save the backgrounds, then
+        # draw the artists on top of them
+        regions = self._regions()
+        self._backgrounds = {name: self.canvas.copy_from_bbox(bbox) for name, (bbox, _) in regions.items()}
+        for _, artists in regions.values():
+            for artist in artists:
+                self.fig.draw_artist(artist)
+
+    def _blit(self, names):
+        regions = self._regions()
+        for name in names:
+            bbox, artists = regions[name]
+            self.canvas.restore_region(self._backgrounds[name])
+            for artist in artists:
+                self.fig.draw_artist(artist)
+            self.canvas.blit(bbox)
+
+    def set(self, name, value):
+        """
+        Change one input, update the program and redraw what changed.
+        """
+        start = time.perf_counter()
+        self.params[name] = float(value)
+        self.message = ""
+        if name in RHEOLOGY:
+            R, v = self._rheology()
+            self.program.update(R=R, v=v)
+        else:
+            self.program.update(**{name: float(value)})
+        changed = [name, "info"]
+        full = False
+        if name in GEOMETRY:
+            self._set_lines()
+            full = self._rescale()
+            changed.append("preview")
+        self._set_info()
+        if full or not self._backgrounds:
+            self.canvas.draw()
+        else:
+            self._blit(changed)
+        self.last_redraw = time.perf_counter() - start
+
+    def write(self, path=None):
+        """
+        Write the current program to `path` (default: the output path).
+        """
+        path = path or self.output
+        with open(path, "w") as f:
+            f.write(self.program.gcode())
+        return path
+
+    def _on_key(self, event):
+        if event.key == "w":
+            self.message = f"G-code saved to {self.write()}"
+            self._set_info()
+            self._blit(["info"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Explore the three-square program inputs with live sliders.")
+    parser.add_argument("--deltax", type=float, default=DEFAULTS["deltax"], help="X spacing of the lattice (mm)")
+    parser.add_argument("--deltay", type=float, default=DEFAULTS["deltay"], help="Y spacing of the lattice (mm)")
+    parser.add_argument("--u1", type=float, default=DEFAULTS["u1"], help="nozzle speed for squares 123 (mm/min)")
+    parser.add_argument("--u2", type=float, default=DEFAULTS["u2"], help="nozzle speed for squares 456 (mm/min)")
+    parser.add_argument("--u3", type=float, default=DEFAULTS["u3"], help="nozzle speed for squares 789 (mm/min)")
+    parser.add_argument("-D", "--diameter", dest="D", type=float, default=DEFAULTS["D"], help="nozzle diameter (mm)")
+    parser.add_argument("--gamma", dest="Gamma", type=float, default=DEFAULTS["Gamma"], help="shear rate (1/s)")
+    parser.add_argument("-n", "--power-law-index", dest="n", type=float, default=DEFAULTS["n"], help="power-law index")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="G-code file written when pressing w")
+    args = parser.parse_args(argv)
+
+    import matplotlib.pyplot as plt
+
+    # Canvas callbacks are weak references: keep the explorer alive while shown
+    explorer = Explorer({name: getattr(args, name) for name in DEFAULTS}, args.output)
+    plt.show()
+    return explorer
+
+
+if __name__ == "__main__":
+    main()
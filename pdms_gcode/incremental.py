@@ -0,0 +1,119 @@
+import numpy as np
+
+from .toolpath import Toolpath, cumulative_extrusion, extrusion_column, format_gcode, three_square_blocks
+
+# Block fed by each speed input; every other input changes all blocks
+SPEED_BLOCKS = {"u1": 0, "u2": 1, "u3": 2}
+
+INPUTS = ("deltax", "deltay", "u1", "u2", "u3", "R", "v")
+
+
+class IncrementalProgram:
+    """
+    The three-square program kept block by block so that changing inputs
+    only redoes the blocks that depend on them. A square depends on its
+    own speed plus the shared geometry, R and v: after a speed change that
+    square is recomputed and reformatted, and the squares after it only
+    have their E column shifted by the change in its total extrusion and
+    their E words rewritten, reusing the rest of every line. Changes to
+    shared inputs rebuild everything.
+
+    Shifted E values can differ from a full regeneration in the last bit
+    of the float, far below the 5 printed decimals.
+    """
+    __slots__ = ("params", "blocks", "E", "ends", "prefixes", "suffixes", "texts", "last_update")
+
+    def __init__(self, deltax, deltay, u1, u2, u3, R, v):
+        self.params = dict(deltax=deltax, deltay=deltay, u1=u1, u2=u2, u3=u3, R=R, v=v)
+        self._rebuild()
+
+    def _rebuild(self):
+        p = self.params
+        self.blocks = [list(block) for block in three_square_blocks(p["deltax"], p["deltay"], p["u1"], p["u2"], p["u3"])]
+        n = len(self.blocks)
+        self.E, self.ends, self.prefixes, self.suffixes, self.texts = ([None] * n for _ in range(5))
+        for k in range(n):
+            self._compute(k)
+        self.last_update = {"recomputed": list(range(n)), "shifted": []}
+
+    def _compute(self, k):
+        """
+        E column, final E and text of block `k`, continuing from the final
+        E of the block before.
+        """
+        x, y, z, f, lengths, hold = self.blocks[k]
+        R, v = self.params["R"], self.params["v"]
+        E0 = self.ends[k - 1] if k else 0.0
+        self.ends[k] = cumulative_extrusion(lengths, f, R, v, E0)[-1]
+        self.E[k] = extrusion_column(lengths, f, R, v, hold, E0)
+        self.texts[k] = format_gcode(x, y, z, self.E[k], f)
+        # Everything but the E number, for cheap rewrites after a shift
+        lines = self.texts[k].split("\n")
+        self.prefixes[k] = [line[:line.index(" E") + 2] for line in lines]
+        self.suffixes[k] = [line[line.index(" F"):] for line in lines]
+
+    def _shift(self, k, offset):
+        self.E[k] = self.E[k] + offset
+        self.ends[k] += offset
+        self.texts[k] = "\n".join(
+            f"{prefix}{e:.5f}{suffix}" for prefix, e, suffix in zip(self.prefixes[k], self.E[k].tolist(), self.suffixes[k])
+        )
+
+    def update(self, **changes):
+        """
+        Change inputs (any of INPUTS) and redo only the affected blocks.
+        Returns a dict listing the blocks that were "recomputed" and those
+        whose E was only "shifted".
+        """
+        unknown = set(changes) - set(INPUTS)
+        if unknown:
+            raise ValueError(f"Unknown inputs {', '.join(sorted(unknown))}, expected some of {', '.join(INPUTS)}")
+        changes = {name: value for name, value in changes.items() if self.params[name] != value}
+        self.params.update(changes)
+        if any(name not in SPEED_BLOCKS for name in changes):
+            self._rebuild()
+            return self.last_update
+
+        changed = {SPEED_BLOCKS[name]: name for name in changes}
+        recomputed, shifted = [], []
+        offset = 0.0
+        for k in range(min(changed, default=len(self.blocks)), len(self.blocks)):
+            if k in changed:
+                old_end = self.ends[k]
+                self.blocks[k][3] = np.full(len(self.blocks[k][3]), float(self.params[changed[k]]))
+                self._compute(k)
+                offset = self.ends[k] - old_end
+                recomputed.append(k)
+            elif offset:
+                self._shift(k, offset)
+                shifted.append(k)
+        self.last_update = {"recomputed": recomputed, "shifted": shifted}
+        return self.last_update
+
+    def gcode(self):
+        """
+        Program text, as generate_gcode() writes it.
+        """
+        return "\n".join(self.texts)
+
+    def toolpath(self):
+        """
+        The current program as a Toolpath, one square per block.
+        """
+        x, y, z, f = (np.concatenate([block[i] for block in self.blocks]) for i in range(4))
+        squares = np.cumsum([0] + [len(block[0]) for block in self.blocks])
+        return Toolpath.from_columns(x, y, z, np.concatenate(self.E), f, squares)
+
+
+def sweep_speed(deltax, deltay, u1, u2, u3, R, v, name, values):
+    """
+    Programs for a sweep of one speed input (`name` is "u1", "u2" or "u3")
+    over `values`, built incrementally: each step recomputes one square
+    and shifts the E of the squares after it. Yields (value, G-code).
+    """
+    if name not in SPEED_BLOCKS:
+        raise ValueError(f"Unknown speed {name!r}, expected one of {', '.join(SPEED_BLOCKS)}")
+    program = IncrementalProgram(deltax, deltay, u1, u2, u3, R, v)
+    for value in values:
+        program.update(**{name: value})
+        yield value, program.gcode()
@@ -0,0 +1,147 @@
+import numpy as np
+
+from .profiling import stage
+from .rheology import calculate_flow_rate
+from .toolpath import three_square_layout
+
+# Planner defaults, roughly those of a small gantry printer; tune per machine
+DEFAULT_ACCELERATION = 500.0  # mm/s^2
+DEFAULT_JUNCTION_DEVIATION = 0.05  # mm
+
+
+def plan_segments(x, y, z, f, starts=None, acceleration=DEFAULT_ACCELERATION,
+                  junction_deviation=DEFAULT_JUNCTION_DEVIATION):
+    """
+    Trapezoidal motion times for every move of one or more concatenated
+    toolpaths (vertex arrays, feed rates in mm/min). `starts` lists the
+    first vertex of each toolpath; moves between toolpaths are ignored and
+    every toolpath starts and ends at rest.
+
+    Corner speeds follow the junction-deviation model. The backward and
+    forward planner passes are solved in closed form on squared speeds:
+    v[k]^2 <= v[k+1]^2 + 2*a*L[k] unrolls into a running minimum, so both
+    passes are one np.minimum.accumulate each.
+
+    Returns (time, entry speed, exit speed) per move, in s and mm/s.
+    """
+    a = float(acceleration)
+    d = np.vstack((np.diff(x), np.diff(y), np.diff(z)))
+    L = np.sqrt((d * d).sum(axis=0))
+    nominal = np.asarray(f, dtype=float)[1:] / 60.0
+    gaps = np.zeros(len(L), dtype=bool)
+    if starts is not None and len(starts) > 1:
+        # Moves from the end of one toolpath to the start of the next
+        gaps[np.asarray(starts[1:]) - 1] = True
+        L = np.where(gaps, 0.0, L)
+    unit = np.divide(d, L, out=np.zeros_like(d), where=L > 0)
+
+    # Squared speed limit at every junction (junction k sits before move k)
+    n = len(L)
+    cap = np.zeros(n + 1)
+    if n > 1:
+        cos_theta = -(unit[:, :-1] * unit[:, 1:]).sum(axis=0)
+        sin_half = np.sqrt(np.clip(0.5 * (1.0 - cos_theta), 0.0, 1.0))
+        with np.errstate(divide="ignore"):
+            corner = np.where(sin_half < 1.0, a * junction_deviation * sin_half / (1.0 - sin_half), np.inf)
+        cap[1:-1] = np.minimum(corner, np.minimum(nominal[:-1], nominal[1:]) ** 2)
+    # Toolpaths start and end at rest
+    cap[np.flatnonzero(gaps)] = 0.0
+    cap[np.flatnonzero(gaps) + 1] = 0.0
+
+    S = np.concatenate(([0.0], np.cumsum(2.0 * a * L)))
+    backward = np.minimum.accumulate((cap + S)[::-1])[::-1] - S
+    forward = np.minimum.accumulate(backward - S) + S
+    v2 = np.maximum(forward, 0.0)
+    v_in, v_out = np.sqrt(v2[:-1]), np.sqrt(v2[1:])
+
+    # Accelerate, cruise, decelerate; no cruise when the move is too short
+    vn = np.maximum(nominal, np.maximum(v_in, v_out))
+    d_acc = (vn ** 2 - v_in ** 2) / (2.0 * a)
+    d_dec = (vn ** 2 - v_out ** 2) / (2.0 * a)
+    cruise = d_acc + d_dec <= L
+    peak = np.sqrt(np.maximum((2.0 * a * L + v_in ** 2 + v_out ** 2) / 2.0, 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(
+            cruise,
+            (vn - v_in) / a + (vn - v_out) / a + (L - d_acc - d_dec) / vn,
+            (peak - v_in) / a + (peak - v_out) / a,
+        )
+    t = np.where(L > 0, t, 0.0)
+    return t, v_in, v_out
+
+
+def _summarise(t, L, nominal, dE, f, squares, Q):
+    """
+    Report for one toolpath from its per-move arrays.
+    """
+    bounds = np.clip(np.asarray(squares) - 1, 0, len(t))
+    square_times = [float(t[a:b].sum()) for a, b in zip(bounds[:-1], bounds[1:])]
+    feeds, block = np.unique(f, return_inverse=True)
+    block_times = np.bincount(block, weights=t, minlength=len(feeds))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        naive = np.where(L > 0, L / nominal, 0.0)
+    extruding = dE > 0
+    return {
+        "time": float(t.sum()),
+        "naive_time": float(naive.sum()),
+        "square_times": square_times,
+        "feed_times": dict(zip(feeds.tolist(), block_times.tolist())),
+        "extruded_volume": Q / 60.0 * float(t[extruding].sum()),  # mm^3
+        "nominal_volume": Q / 60.0 * float(naive[extruding].sum()),  # mm^3
+    }
+
+
+@stage("estimate_print")
+def estimate_print(toolpath, Q, acceleration=DEFAULT_ACCELERATION,
+                   junction_deviation=DEFAULT_JUNCTION_DEVIATION):
+    """
+    Print time and material estimate for a Toolpath. `Q` is the flow rate
+    from calculate_flow_rate() in mm^3/min; the ink is taken to flow at
+    that rate for the whole duration of every extruding move.
+    Times are in seconds, per square and per feed rate.
+    """
+    x, y, z, f = toolpath.x, toolpath.y, toolpath.z, toolpath.f
+    t, _, _ = plan_segments(x, y, z, f, None, acceleration, junction_deviation)
+    L = np.sqrt(np.diff(x) ** 2 + np.diff(y) ** 2 + np.diff(z) ** 2)
+    return _summarise(t, L, f[1:] / 60.0, np.diff(toolpath.e), f[1:], toolpath.squares, Q)
+
+
+def estimate_sweep(grid, acceleration=DEFAULT_ACCELERATION,
+                   junction_deviation=DEFAULT_JUNCTION_DEVIATION):
+    """
+    Estimates for every parameter set of a sweep (see batch.load_grid).
+    All programs are planned in one pass over their concatenated moves.
+    Returns one dict per set holding the parameters, "time" (s),
+    "naive_time" (s) and "extruded_volume" (mm^3).
+    """
+    if not grid:
+        return []
+    columns, starts = [], [0]
+    for params in grid:
+        layout = three_square_layout(
+            params["deltax"], params["deltay"], params["u1"], params["u2"], params["u3"]
+        )
+        columns.append(layout)
+        starts.append(starts[-1] + len(layout[0]))
+    Gamma, D, n = (np.array([params[name] for params in grid]) for name in ("Gamma", "D", "n"))
+    flows = calculate_flow_rate(Gamma, D, n)
+    x, y, z, f, delta, hold = (np.concatenate(column) for column in zip(*columns))
+    starts = np.array(starts)
+
+    t, _, _ = plan_segments(x, y, z, f, starts[:-1], acceleration, junction_deviation)
+    L = np.sqrt(np.diff(x) ** 2 + np.diff(y) ** 2 + np.diff(z) ** 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        naive = np.where(L > 0, L / (f[1:] / 60.0), 0.0)
+    naive[starts[1:-1] - 1] = 0.0
+    # A move extrudes unless it holds the previous E or has no metered length
+    extruding = (~hold[1:]) & (delta[1:] > 0)
+
+    # Moves of program p are [starts[p], starts[p+1] - 1)
+    first = starts[:-1]
+    time = np.add.reduceat(t, first)
+    naive_time = np.add.reduceat(naive, first)
+    extruding_time = np.add.reduceat(np.where(extruding, t, 0.0), first)
+    results = []
+    for params, Q, T, N, TE in zip(grid, flows, time, naive_time, extruding_time):
+        results.append(dict(params, time=float(T), naive_time=float(N), extruded_volume=float(Q / 60.0 * TE)))
+    return results
@@ -0,0 +1,32 @@
+from .profiling import stage
+
+
+@stage("plot_printing_pattern")
+def plot_printing_pattern(coords, path=None):
+    """
+    Plot the 2D printing pattern based on the coordinates.
+    With `path` the figure is rendered off-screen with Agg and saved;
+    otherwise it opens in an interactive window. matplotlib is only
+    imported here, so generating G-code never pays for it.
+    """
+    x_vals, y_vals = zip(*coords)
+    if path is None:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=(6, 6))
+    else:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=(6, 6))
+        FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot(x_vals, y_vals, marker='o', linestyle='-', color='b')
+    ax.set_title("2D Printing Pattern")
+    ax.set_xlabel("X (mm)")
+    ax.set_ylabel("Y (mm)")
+    ax.grid(True)
+    ax.set_xlim(min(x_vals) - 10, max(x_vals) + 10)
+    ax.set_ylim(min(y_vals) - 10, max(y_vals) + 10)
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path)
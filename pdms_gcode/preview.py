@@ -0,0 +1,157 @@
+import os
+
+import numpy as np
+
+from .profiling import stage
+
+# Above this many segments after thinning the path is drawn as one image
+MAX_VECTOR_SEGMENTS = 5000
+# Pixels painted per pass when rasterizing
+RASTER_CHUNK = 1 << 16
+
+
+def pixel_segments(x, y, key, width, height, extent):
+    """
+    Distinct moves of the path once snapped to a `width` x `height` pixel
+    grid. Moves that start and end on the same pixels with the same colour
+    `key` are drawn only once, whichever direction they were travelled in,
+    and zero-length moves are dropped. Returns the segments in data
+    coordinates and their keys.
+    """
+    xmin, xmax, ymin, ymax = extent
+    sx = (width - 1) / max(xmax - xmin, 1e-12)
+    sy = (height - 1) / max(ymax - ymin, 1e-12)
+    px = np.rint((x - xmin) * sx).astype(np.int64)
+    py = np.rint((y - ymin) * sy).astype(np.int64)
+    pixel = py * width + px
+
+    a, b = pixel[:-1], pixel[1:]
+    k = key[1:].astype(np.int64)  # each move takes the colour of the vertex it ends on
+    moving = a != b
+    a, b, k = np.minimum(a, b)[moving], np.maximum(a, b)[moving], k[moving]
+    n_pixels = width * height
+    unique = np.unique((k * n_pixels + a) * n_pixels + b)
+    b = unique % n_pixels
+    a = (unique // n_pixels) % n_pixels
+    k = unique // (n_pixels * n_pixels)
+
+    segments = np.empty((len(unique), 2, 2))
+    segments[:, 0, 0] = a % width / sx + xmin
+    segments[:, 0, 1] = a // width / sy + ymin
+    segments[:, 1, 0] = b % width / sx + xmin
+    segments[:, 1, 1] = b // width / sy + ymin
+    return segments, k
+
+
+def rasterize_segments(segments, colors, width, height, extent):
+    """
+    Paint segments (in data coordinates) one pixel wide into a `height` x
+    `width` 8-bit RGBA image covering `extent`, with one sample per pixel along
+    the longer axis of every segment. Later segments are painted over
+    earlier ones; pixels no segment crosses stay transparent.
+    """
+    xmin, xmax, ymin, ymax = extent
+    px = (segments[:, :, 0] - xmin) * (width / (xmax - xmin))
+    py = (segments[:, :, 1] - ymin) * (height / (ymax - ymin))
+    steps = np.ceil(np.maximum(abs(px[:, 1] - px[:, 0]), abs(py[:, 1] - py[:, 0]))).astype(np.int64) + 1
+    ends = np.cumsum(steps)
+    image = np.zeros((height, width, 4), dtype=np.uint8)
+    colors = (np.asarray(colors) * 255).round().astype(np.uint8)
+    # Whole segments per pass, about RASTER_CHUNK samples each
+    cuts = np.searchsorted(ends, np.arange(RASTER_CHUNK, ends[-1] if len(ends) else 0, RASTER_CHUNK))
+    for a, b in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(steps)]))):
+        n = steps[a:b]
+        seg = np.repeat(np.arange(a, b), n)
+        t = (np.arange(len(seg)) - np.repeat(np.cumsum(n) - n, n)) / np.repeat(np.maximum(n - 1, 1), n)
+        col = (px[seg, 0] + t * (px[seg, 1] - px[seg, 0])).astype(np.int64).clip(0, width - 1)
+        row = (py[seg, 0] + t * (py[seg, 1] - py[seg, 0])).astype(np.int64).clip(0, height - 1)
+        image[row, col] = colors[seg]
+    return image
+
+
+@stage("render_preview")
+def render_preview(x, y, path, z=None, f=None, color_by="layer", size=(6, 6), dpi=100, margin=10):
+    """
+    Save a preview of the toolpath to `path` (PNG, SVG, ... by extension).
+    The whole path is drawn as one LineCollection on an off-screen Agg
+    canvas, with every move coloured by its layer (Z band) or feed rate.
+    Moves are first thinned on the pixel grid of the axes; when more than
+    MAX_VECTOR_SEGMENTS remain (dense beds), they are painted into one
+    image of the axes' size instead, which renders and saves (SVG too) in
+    time independent of the segment count. Returns the number of segments
+    drawn after pixel thinning.
+    """
+    from matplotlib import colormaps
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Patch
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if color_by == "layer":
+        values, label, unit = z, "Z", "mm"
+    elif color_by == "feed":
+        values, label, unit = f, "F", "mm/min"
+    else:
+        raise ValueError(f"Unknown color_by {color_by!r}, expected 'layer' or 'feed'")
+    if values is None:
+        values = np.zeros(len(x))
+    levels, key = np.unique(np.asarray(values, dtype=float), return_inverse=True)
+
+    extent = (x.min() - margin, x.max() + margin, y.min() - margin, y.max() + margin)
+    fig = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    box = ax.get_window_extent()
+    width, height = max(int(round(box.width)), 1), max(int(round(box.height)), 1)
+    segments, seg_key = pixel_segments(x, y, key, width, height, extent)
+
+    cmap = colormaps["viridis"].resampled(max(len(levels), 2))
+    palette = cmap(np.linspace(0, 1, max(len(levels), 2)))[:len(levels)]
+    if len(segments) > MAX_VECTOR_SEGMENTS:
+        image = rasterize_segments(segments, palette[seg_key], width, height, extent)
+        ax.imshow(image, origin="lower", extent=extent, interpolation="nearest", aspect="auto", zorder=2)
+    else:
+        ax.add_collection(LineCollection(segments, colors=palette[seg_key], linewidths=1))
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[2], extent[3])
+    ax.set_title("2D Printing Pattern")
+    ax.set_xlabel("X (mm)")
+    ax.set_ylabel("Y (mm)")
+    ax.grid(True)
+    if len(levels) <= 12:
+        ax.legend(
+            handles=[Patch(color=c, label=f"{label}{level:g} {unit}") for c, level in zip(palette, levels)],
+            loc="upper right", fontsize="small",
+        )
+    fig.savefig(path)
+    return len(segments)
+
+
+def _render_chunk(start, chunk, out_dir, color_by):
+    """
+    Work unit for a pool worker: previews for a contiguous slice of a sweep.
+    """
+    from .toolpath import three_square_layout
+
+    paths = []
+    for index, params in enumerate(chunk, start):
+        x, y, z, f = three_square_layout(
+            params["deltax"], params["deltay"], params["u1"], params["u2"], params["u3"]
+        )[:4]
+        path = os.path.join(out_dir, f"program_{index:06d}.png")
+        render_preview(x, y, path, z=z, f=f, color_by=color_by)
+        paths.append(path)
+    return paths
+
+
+def render_previews(grid, out_dir, color_by="layer", workers=None, chunksize=None):
+    """
+    Render a preview for every parameter set of a sweep across a process
+    pool. Returns the image paths and the number of images per second.
+    """
+    from .batch import map_chunks
+
+    os.makedirs(out_dir, exist_ok=True)
+    return map_chunks(_render_chunk, grid, workers, chunksize, out_dir, color_by)
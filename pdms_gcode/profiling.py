@@ -0,0 +1,286 @@
+import contextlib
+import functools
+import glob
+import json
+import os
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# The running Profiler, if any; stages only check this when disabled
+_active = None
+
+
+class Profiler:
+    """
+    Per-stage wall time, call counts, bytes written and (with `memory`)
+    peak traced memory of the functions decorated with stage(). Stages
+    nest: "time" includes the stages called inside, "self_time" does not,
+    and "peak_bytes" is the most memory held above what was allocated
+    when the stage was entered. With `cprofile` (a path) the run is also
+    profiled by cProfile and its stats dumped there.
+    """
+
+    def __init__(self, memory=False, cprofile=None):
+        if memory and not hasattr(tracemalloc, "reset_peak"):
+            raise RuntimeError("Per-stage memory tracing needs Python 3.9 or later")
+        self.memory = memory
+        self.cprofile = cprofile
+        self.stages = {}
+        self._stack = []
+        self._started = None
+        self._profile = None
+        self._tracing = False
+        self.wall_time = None
+
+    def start(self):
+        global _active
+        if _active is not None:
+            raise RuntimeError("Profiling is already enabled")
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        if self.cprofile:
+            import cProfile
+
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._started = time.perf_counter()
+        _active = self
+        return self
+
+    def stop(self):
+        """
+        Stop collecting and return the report.
+        """
+        global _active
+        _active = None
+        self.wall_time = time.perf_counter() - self._started
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.cprofile)
+        if self._tracing:
+            tracemalloc.stop()
+        return self.report()
+
+    def enter(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = {"calls": 0, "time": 0.0, "self_time": 0.0, "bytes": 0, "peak_bytes": 0}
+        # Frame: stats, start, time in nested stages, traced memory at entry,
+        # and the peak of nested stages since tracemalloc's was last reset
+        frame = [stats, 0.0, 0.0, 0, 0]
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1][4] = max(self._stack[-1][4], peak)
+            tracemalloc.reset_peak()
+            frame[3] = current
+        self._stack.append(frame)
+        frame[1] = time.perf_counter()
+
+    def exit(self):
+        elapsed = time.perf_counter() - self._stack[-1][1]
+        stats, _, nested, base, carried = self._stack.pop()
+        stats["calls"] += 1
+        stats["time"] += elapsed
+        stats["self_time"] += elapsed - nested
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        if self.memory:
+            peak = max(tracemalloc.get_traced_memory()[1], carried)
+            stats["peak_bytes"] = max(stats["peak_bytes"], peak - base)
+            if self._stack:
+                self._stack[-1][4] = max(self._stack[-1][4], peak)
+
+    def count_bytes(self, n):
+        if self._stack:
+            self._stack[-1][0]["bytes"] += n
+
+    def report(self):
+        """
+        The statistics collected so far as a JSON-serialisable dict.
+        """
+        report = {
+            "pids": [os.getpid()],
+            "processes": 1,
+            "wall_time": self.wall_time,
+            "max_rss_bytes": _max_rss(),
+            "memory_traced": self.memory,
+            "stages": {name: dict(stats) for name, stats in self.stages.items()},
+        }
+        if self.cprofile:
+            report["cprofile"] = [self.cprofile]
+        return report
+
+
+def _max_rss():
+    if resource is None:
+        return None
+    # Linux reports kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def stage(name):
+    """
+    Decorator timing every call of a function as stage `name` while
+    profiling is enabled. When it is not, the only cost is one check of a
+    module global per call.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _active
+            if profiler is None:
+                return func(*args, **kwargs)
+            profiler.enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.exit()
+        return wrapper
+    return decorate
+
+
+def iterate(name, iterable):
+    """
+    Yield the items of `iterable`, timing the work of producing each one
+    as stage `name`. This covers generators, whose body stage() cannot
+    time, without the consumer's own work between items.
+    """
+    iterator = iter(iterable)
+    while True:
+        profiler = _active
+        if profiler is not None:
+            profiler.enter(name)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            if profiler is not None:
+                profiler.exit()
+        yield item
+
+
+def count_bytes(n):
+    """
+    Add `n` bytes written to the innermost running stage.
+    """
+    if _active is not None:
+        _active.count_bytes(n)
+
+
+def enable(memory=False, cprofile=None):
+    """
+    Start collecting stage statistics in this process. Returns the
+    Profiler.
+    """
+    return Profiler(memory, cprofile).start()
+
+
+def disable():
+    """
+    Stop collecting and return the report, or None when profiling was not
+    enabled.
+    """
+    return None if _active is None else _active.stop()
+
+
+@contextlib.contextmanager
+def profiled(report=None, memory=False, cprofile=None):
+    """
+    Profile the enclosed block, writing the JSON report to `report` when
+    given. Yields the Profiler.
+    """
+    profiler = enable(memory, cprofile)
+    try:
+        yield profiler
+    finally:
+        result = profiler.stop()
+        if report is not None:
+            write_report(result, report)
+
+
+def write_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
+
+
+def merge_reports(reports):
+    """
+    One report for several processes or runs: calls, times and bytes are
+    summed, peaks are the largest seen and "wall_time" is the summed
+    wall time of the runs (CPU time across workers, not elapsed time).
+    """
+    merged = {"pids": [], "processes": 0, "wall_time": 0.0, "max_rss_bytes": None, "memory_traced": True,
+              "stages": {}}
+    profiles = []
+    for report in reports:
+        merged["pids"].extend(pid for pid in report["pids"] if pid not in merged["pids"])
+        merged["processes"] = len(merged["pids"])
+        merged["wall_time"] += report["wall_time"] or 0.0
+        if report["max_rss_bytes"] is not None:
+            merged["max_rss_bytes"] = max(merged["max_rss_bytes"] or 0, report["max_rss_bytes"])
+        merged["memory_traced"] = merged["memory_traced"] and report["memory_traced"]
+        profiles.extend(report.get("cprofile", []))
+        for name, stats in report["stages"].items():
+            total = merged["stages"].setdefault(
+                name, {"calls": 0, "time": 0.0, "self_time": 0.0, "bytes": 0, "peak_bytes": 0}
+            )
+            for key in ("calls", "time", "self_time", "bytes"):
+                total[key] += stats[key]
+            total["peak_bytes"] = max(total["peak_bytes"], stats["peak_bytes"])
+    if profiles:
+        merged["cprofile"] = profiles
+    return merged
+
+
+def clear_reports(directory, pattern="chunk_*"):
+    """
+    Remove the worker reports of a previous sweep from `directory`.
+    """
+    for path in glob.glob(os.path.join(directory, pattern)):
+        os.remove(path)
+
+
+def aggregate(directory, pattern="chunk_*.json"):
+    """
+    Merge the reports in `directory` written by sweep workers into
+    report.json, and their cProfile stats into profile.prof. Returns the
+    merged report.
+    """
+    reports = []
+    for path in sorted(glob.glob(os.path.join(directory, pattern))):
+        with open(path) as f:
+            reports.append(json.load(f))
+    merged = merge_reports(reports)
+    if merged.get("cprofile"):
+        import pstats
+
+        combined = os.path.join(directory, "profile.prof")
+        pstats.Stats(*merged["cprofile"]).dump_stats(combined)
+        merged["cprofile"] = [combined]
+    write_report(merged, os.path.join(directory, "report.json"))
+    return merged
+
+
+def format_report(report):
+    """
+    The stages of a report as a text table, slowest first.
+    """
+    lines = [f"{'stage':<28}{'calls':>8}{'time (s)':>12}{'self (s)':>12}{'MB written':>12}{'peak MB':>10}"]
+    stages = sorted(report["stages"].items(), key=lambda item: -item[1]["time"])
+    for name, stats in stages:
+        peak = f"{stats['peak_bytes'] / 2 ** 20:>10.2f}" if report["memory_traced"] else f"{'-':>10}"
+        lines.append(f"{name:<28}{stats['calls']:>8}{stats['time']:>12.4f}{stats['self_time']:>12.4f}"
+                     f"{stats['bytes'] / 2 ** 20:>12.2f}{peak}")
+    summary = f"{report['processes']} process(es), {report['wall_time']:.3f} s profiled"
+    if report["max_rss_bytes"]:
+        summary += f", max RSS {report['max_rss_bytes'] / 2 ** 20:.1f} MB"
+    lines.append(summary)
+    return "\n".join(lines)
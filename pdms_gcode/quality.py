@@ -0,0 +1,260 @@
+import argparse
+import csv
+import glob
+import os
+
+import numpy as np
+
+IMAGE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.tif", "*.tiff", "*.bmp", "*.npy")
+
+# Rows processed at a time when scanning an image, to bound temporaries
+ROW_CHUNK = 1024
+
+
+def load_image(path, max_pixels=None):
+    """
+    Load a specimen photo as a 2D grayscale array. .npy files are memory
+    mapped, so only the rows that are touched are read from disk. Other
+    formats go through Pillow; images above `max_pixels` are decoded at a
+    reduced size. Returns the image and the downscale factor applied.
+    """
+    if path.lower().endswith(".npy"):
+        return np.load(path, mmap_mode="r"), 1
+
+    from PIL import Image
+
+    with Image.open(path) as img:
+        width = img.width
+        if max_pixels and img.width * img.height > max_pixels:
+            # JPEG can decode straight to a smaller size; reduce the rest
+            factor = int(np.ceil(np.sqrt(img.width * img.height / max_pixels)))
+            img.draft("L", (img.width // factor, img.height // factor))
+            factor = int(np.ceil(np.sqrt(img.width * img.height / max_pixels)))
+            if factor > 1:
+                img = img.reduce(factor)
+        return np.asarray(img.convert("L")), width / img.width
+
+
+def _gray_rows(image, start, stop):
+    rows = np.asarray(image[start:stop], dtype=np.float32)
+    return rows.mean(axis=2) if rows.ndim == 3 else rows
+
+
+def otsu_threshold(image):
+    """
+    Otsu threshold of a grayscale image, accumulating the 256-bin histogram
+    chunk by chunk so memory-mapped images are never fully loaded.
+    """
+    hist = np.zeros(256)
+    lo, hi = np.inf, -np.inf
+    for i in range(0, image.shape[0], ROW_CHUNK):
+        rows = _gray_rows(image, i, i + ROW_CHUNK)
+        lo, hi = min(lo, rows.min()), max(hi, rows.max())
+    if hi <= lo:
+        return lo
+    for i in range(0, image.shape[0], ROW_CHUNK):
+        rows = _gray_rows(image, i, i + ROW_CHUNK)
+        hist += np.bincount(((rows - lo) * (255 / (hi - lo))).astype(np.int64).ravel(), minlength=256)[:256]
+    p = hist / hist.sum()
+    omega = np.cumsum(p)
+    mu = np.cumsum(p * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mu[-1] * omega - mu) ** 2 / (omega * (1 - omega))
+    return lo + (np.nanargmax(between) + 0.5) * (hi - lo) / 255
+
+
+def segment_filament(image, dark_filament=True, threshold=None, opening=1):
+    """
+    Binary filament mask. The threshold defaults to Otsu's; the filament is
+    taken to be darker than the background unless `dark_filament` is False.
+    A binary opening of `opening` iterations removes speckle.
+    """
+    from scipy import ndimage
+
+    if threshold is None:
+        threshold = otsu_threshold(image)
+    mask = np.empty(image.shape[:2], dtype=bool)
+    for i in range(0, image.shape[0], ROW_CHUNK):
+        rows = _gray_rows(image, i, i + ROW_CHUNK)
+        mask[i:i + ROW_CHUNK] = rows < threshold if dark_filament else rows > threshold
+    if opening:
+        mask = ndimage.binary_opening(mask, iterations=opening)
+    return mask
+
+
+def strand_widths(mask):
+    """
+    Local strand widths (pixels) sampled along the strand centre lines,
+    taken as twice the distance to the background at the ridge of the
+    distance transform.
+    """
+    from scipy import ndimage
+
+    dist = ndimage.distance_transform_edt(mask)
+    ridge = mask & (dist >= ndimage.maximum_filter(dist, size=3))
+    return 2 * dist[ridge] - 1
+
+
+def close_to_bounds(mask, min_fraction=0.25):
+    """
+    The mask cropped to its filament bounding box and framed with one
+    pixel of filament, so that background open at the edge of the box
+    (the channels between serpentine strands, open at alternate ends) is
+    enclosed. Edge rows and columns holding less than `min_fraction` of
+    the filament of the densest one are left out of the box: single
+    strands leading into or out of a square must not widen it.
+    """
+    rows, cols = mask.sum(axis=1), mask.sum(axis=0)
+    if not rows.any():
+        return np.ones((2, 2), dtype=bool)
+    rows = np.flatnonzero(rows >= min_fraction * rows.max())
+    cols = np.flatnonzero(cols >= min_fraction * cols.max())
+    return np.pad(mask[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1], 1, constant_values=True)
+
+
+def pore_metrics(mask, closed=False):
+    """
+    Areas (pixels), perimeters (pixel edges) and printability indices
+    Pr = perimeter^2 / (16 * area) of the pores: background regions fully
+    enclosed by filament. Pr is 1 for a square pore. With `closed` the
+    mask is closed against its filament bounding box first (see
+    close_to_bounds), so the channels of a serpentine count as pores.
+    """
+    from scipy import ndimage
+
+    if closed:
+        mask = close_to_bounds(mask)
+    labels, count = ndimage.label(~mask)
+    if count == 0:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    # Background touching the border is not a pore
+    border = np.unique(np.concatenate((labels[0], labels[-1], labels[:, 0], labels[:, -1])))
+    area = np.bincount(labels.ravel(), minlength=count + 1).astype(float)
+
+    # Perimeter: pixel edges between a pore and anything else
+    perimeter = np.zeros(count + 1)
+    for a, b in ((labels[:, 1:], labels[:, :-1]), (labels[1:], labels[:-1])):
+        edge = a != b
+        perimeter += np.bincount(a[edge], minlength=count + 1)
+        perimeter += np.bincount(b[edge], minlength=count + 1)
+
+    pores = np.setdiff1d(np.arange(1, count + 1), border)
+    area, perimeter = area[pores], perimeter[pores]
+    return area, perimeter, perimeter ** 2 / (16 * area)
+
+
+def square_columns(mask, blocks=3, deltax=None):
+    """
+    Column ranges of the square/speed blocks in a filament mask. With
+    `deltax` the ranges follow the three-square layout (squares at X
+    offsets k*(20 + deltax), each deltax wide) mapped onto the filament
+    bounding box; otherwise the box is split into `blocks` equal bands.
+    """
+    cols = np.flatnonzero(mask.any(axis=0))
+    if len(cols) == 0:
+        return []
+    left, right = cols[0], cols[-1] + 1
+    if deltax is None:
+        edges = np.linspace(left, right, blocks + 1).round().astype(int)
+        return list(zip(edges[:-1], edges[1:]))
+    scale = (right - left) / (2 * (20 + deltax) + deltax)
+    spans = []
+    for k in range(blocks):
+        x0 = k * (20 + deltax)
+        a = left + int(np.floor((x0 - 0.25 * deltax) * scale))
+        b = left + int(np.ceil((x0 + 1.25 * deltax) * scale))
+        spans.append((max(a, left), min(b, right)))
+    return spans
+
+
+def score_mask(mask, pixels_per_mm=None, blocks=3, deltax=None):
+    """
+    Quality metrics of a segmented specimen, one dict per square/speed
+    block: strand width mean/std and uniformity (1 - CV), pore count, mean
+    pore area and mean printability index. Pores are the background
+    regions enclosed by filament once each block is closed against its
+    filament bounding box, so the channels between strands count. Lengths
+    are in mm when `pixels_per_mm` is given, pixels otherwise.
+    """
+    scale = 1.0 / pixels_per_mm if pixels_per_mm else 1.0
+    scores = []
+    for k, (a, b) in enumerate(square_columns(mask, blocks, deltax)):
+        block = mask[:, a:b]
+        widths = strand_widths(block) * scale
+        area, _, pr = pore_metrics(block, closed=True)
+        mean = float(widths.mean()) if len(widths) else float("nan")
+        std = float(widths.std()) if len(widths) else float("nan")
+        scores.append({
+            "block": k,
+            "filament_fraction": float(block.mean()),
+            "strand_width_mean": mean,
+            "strand_width_std": std,
+            "width_uniformity": 1 - std / mean if mean else float("nan"),
+            "pore_count": len(area),
+            "pore_area_mean": float(area.mean() * scale ** 2) if len(area) else float("nan"),
+            "printability_index": float(pr.mean()) if len(pr) else float("nan"),
+        })
+    return scores
+
+
+def score_image(path, pixels_per_mm=None, blocks=3, deltax=None, dark_filament=True, max_pixels=None):
+    """
+    Load, segment and score one specimen photo.
+    """
+    image, factor = load_image(path, max_pixels)
+    mask = segment_filament(image, dark_filament)
+    ppm = pixels_per_mm / factor if pixels_per_mm else None
+    return [dict(score, image=path) for score in score_mask(mask, ppm, blocks, deltax)]
+
+
+def _score_chunk(start, paths, options):
+    """
+    Work unit for a pool worker: scores for a slice of the image list.
+    """
+    results = []
+    for path in paths:
+        results.extend(score_image(path, **options))
+    return results
+
+
+def score_directory(directory, workers=None, chunksize=None, **options):
+    """
+    Score every image in `directory` across a process pool. Options are
+    passed to score_image(). Returns the per-block scores and the number of
+    images scored.
+    """
+    from .batch import map_chunks
+
+    paths = sorted({p for pattern in IMAGE_PATTERNS for p in glob.glob(os.path.join(directory, pattern))})
+    scores, _ = map_chunks(_score_chunk, paths, workers, chunksize or 1, options)
+    return scores, len(paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score printed lattice specimens from photos.")
+    parser.add_argument("directory", help="directory of specimen images")
+    parser.add_argument("-o", "--output", default="quality_scores.csv", help="CSV file for the scores")
+    parser.add_argument("--pixels-per-mm", type=float, help="image scale, to report lengths in mm")
+    parser.add_argument("--deltax", type=float, help="deltax of the printed program, to locate the squares")
+    parser.add_argument("--blocks", type=int, default=3, help="square/speed blocks per specimen")
+    parser.add_argument("--light-filament", action="store_true", help="filament is lighter than the background")
+    parser.add_argument("--max-pixels", type=int, help="downscale images larger than this many pixels")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    scores, images = score_directory(
+        args.directory, args.workers,
+        pixels_per_mm=args.pixels_per_mm, blocks=args.blocks, deltax=args.deltax,
+        dark_filament=not args.light_filament, max_pixels=args.max_pixels,
+    )
+    fields = ("image", "block", "filament_fraction", "strand_width_mean", "strand_width_std",
+              "width_uniformity", "pore_count", "pore_area_mean", "printability_index")
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(scores)
+    print(f"Scored {images} images, {len(scores)} blocks, saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import hashlib
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from .toolpath import three_square_layout
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pdms_gcode", "masks")
+
+# Reference masks kept on disk before the least recently used are evicted
+MAX_DISK_MASKS = 256
+
+
+def rasterize_path(x, y, width, pixels_per_mm, extruding=None, margin=2.0):
+    """
+    Binary image of a path drawn with strands `width` mm wide at
+    `pixels_per_mm`. Every move is sampled at half-pixel spacing in one
+    vectorised pass and the centre lines are grown to the strand width
+    with a Euclidean distance transform, so no per-pixel Python loop is
+    involved. Only moves flagged in `extruding` are drawn (all by
+    default). Row 0 is the top of the image (largest Y); `margin` mm of
+    background surrounds the path.
+    """
+    from scipy import ndimage
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    xmin, ymax = x.min() - margin, y.max() + margin
+    shape = (
+        int(np.ceil((y.max() - y.min() + 2 * margin) * pixels_per_mm)) + 1,
+        int(np.ceil((x.max() - x.min() + 2 * margin) * pixels_per_mm)) + 1,
+    )
+    x0, y0, x1, y1 = x[:-1], y[:-1], x[1:], y[1:]
+    if extruding is not None:
+        x0, y0, x1, y1 = x0[extruding], y0[extruding], x1[extruding], y1[extruding]
+
+    # Half-pixel samples along every segment, endpoints included
+    samples = np.ceil(np.hypot(x1 - x0, y1 - y0) * pixels_per_mm * 2).astype(np.int64) + 1
+    seg = np.repeat(np.arange(len(samples)), samples)
+    first = np.concatenate(([0], np.cumsum(samples)[:-1]))
+    t = (np.arange(seg.size) - first[seg]) / np.maximum(samples[seg] - 1, 1)
+    px = np.rint((x0[seg] + t * (x1[seg] - x0[seg]) - xmin) * pixels_per_mm).astype(np.int64)
+    py = np.rint((ymax - (y0[seg] + t * (y1[seg] - y0[seg]))) * pixels_per_mm).astype(np.int64)
+
+    centre = np.zeros(shape, dtype=bool)
+    centre[py, px] = True
+    radius = width / 2 * pixels_per_mm
+    return ndimage.distance_transform_edt(~centre) <= radius
+
+
+def _mask_key(deltax, deltay, D, pixels_per_mm):
+    # Rounded so values parsed from different sources share an entry
+    return tuple(round(float(value), 9) for value in (deltax, deltay, D, pixels_per_mm))
+
+
+def _disk_path(cache_dir, key):
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+    return os.path.join(cache_dir, f"mask_{digest}.npz")
+
+
+def _evict(cache_dir, keep=MAX_DISK_MASKS):
+    """
+    Remove the least recently used masks beyond `keep`, by modification
+    time, which every read refreshes.
+    """
+    entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.startswith("mask_")]
+    if len(entries) <= keep:
+        return
+    entries.sort(key=os.path.getmtime)
+    for path in entries[:len(entries) - keep]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@lru_cache(maxsize=64)
+def _cached_mask(key, cache_dir):
+    deltax, deltay, D, pixels_per_mm = key
+    path = _disk_path(cache_dir, key) if cache_dir else None
+    if path and os.path.exists(path):
+        with np.load(path) as data:
+            mask = np.unpackbits(data["bits"], count=int(np.prod(data["shape"]))).reshape(data["shape"]).astype(bool)
+        os.utime(path)
+    else:
+        x, y, _, _, _, hold = three_square_layout(deltax, deltay, 1.0, 1.0, 1.0)
+        mask = rasterize_path(x, y, D, pixels_per_mm, extruding=~hold[1:])
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez_compressed(tmp, bits=np.packbits(mask), shape=np.array(mask.shape))
+            os.replace(tmp, path)
+            _evict(cache_dir)
+    mask.setflags(write=False)
+    return mask
+
+
+def reference_mask(deltax, deltay, D, pixels_per_mm, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Ideal-print mask of the three-square program: the extruding moves
+    drawn with strands of nozzle diameter `D`. Masks are cached in memory
+    (LRU) and, unless `cache_dir` is None, on disk as bit-packed .npz
+    files, so repeated comparisons reuse a few renders. The returned
+    array is shared and read-only.
+    """
+    return _cached_mask(_mask_key(deltax, deltay, D, pixels_per_mm), cache_dir)
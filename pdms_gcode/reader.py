@@ -0,0 +1,155 @@
+import numpy as np
+
+from .toolpath import Toolpath
+
+# Bytes parsed at a time, to bound temporaries on very large files
+CHUNK_BYTES = 1 << 20
+
+LETTERS = "GMXYZEF"
+
+# Byte classes: 1 for letters, 2 for characters of numbers
+_CLASS = np.zeros(256, dtype=np.uint8)
+_CLASS[np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ", dtype=np.uint8)] = 1
+_CLASS[np.frombuffer(b"0123456789.-+", dtype=np.uint8)] = 2
+
+# Row of each letter of LETTERS in the parsed table, -1 for the others
+_ROW = np.full(256, -1)
+_ROW[np.frombuffer(LETTERS.encode(), dtype=np.uint8)] = np.arange(len(LETTERS))
+
+# Longest number read, in characters
+MAX_NUMBER = 24
+
+_POWERS = 10.0 ** np.arange(MAX_NUMBER + 1)
+
+
+def parse_words(data):
+    """
+    Every address word of a G-code text (bytes), parsed in bulk on the raw
+    byte array: comments after ';' are blanked, bytes are classified with
+    one table lookup and the numbers of all words are assembled digit
+    column by digit column, so no per-line or per-word Python code runs.
+    Numbers must follow their letter directly, as in "X12.5"; words
+    without one get NaN.
+    Returns the line index (0-based), letter byte and value of every word.
+    """
+    data = data.upper()
+    a = np.frombuffer(data, dtype=np.uint8)
+    if b";" in data:
+        # Blank from every ';' to the end of its line
+        a = a.copy()
+        newlines = np.flatnonzero(a == ord("\n"))
+        semicolons = np.flatnonzero(a == ord(";"))
+        stops = np.append(newlines, len(a))[np.searchsorted(newlines, semicolons)]
+        depth = np.zeros(len(a) + 1, dtype=np.int64)
+        np.add.at(depth, semicolons, 1)
+        np.add.at(depth, stops, -1)
+        a[np.cumsum(depth[:-1]) > 0] = ord(" ")
+    cls = np.take(_CLASS, a)
+
+    # Words are the letters among the non-numeric bytes; the next such byte
+    # ends their number, and newlines among them count the lines
+    breaks = np.flatnonzero(cls != 2)
+    kinds = a[breaks]
+    k = np.flatnonzero(np.take(_CLASS, kinds) == 1)
+    words = breaks[k]
+    line = np.cumsum(kinds == ord("\n"), dtype=np.int64)[k]
+    length = np.minimum(np.append(breaks, len(a))[k + 1] - words - 1, MAX_NUMBER)
+
+    # Integer mantissa by Horner's rule over the character columns of every
+    # number at once, then scaled by the count of fraction digits
+    width = int(length.max()) if len(words) else 0
+    padded = np.append(a, np.zeros(width + 1, dtype=np.uint8))
+    chars = np.ascontiguousarray(np.lib.stride_tricks.sliding_window_view(padded, max(width, 1))[words + 1].T)
+    length = length.astype(np.uint8)
+    mantissa = np.zeros(len(words), dtype=np.int64)
+    fraction = np.zeros(len(words), dtype=np.int64)
+    seen_dot = np.zeros(len(words), dtype=bool)
+    for j in range(width):
+        column = chars[j]
+        digit = column - np.uint8(ord("0"))
+        is_digit = digit < 10
+        is_digit &= length > j
+        np.multiply(mantissa, 10, out=mantissa, where=is_digit)
+        mantissa += digit * is_digit
+        fraction += is_digit & seen_dot
+        seen_dot |= column == ord(".")
+    value = np.where(chars[0] == ord("-"), -mantissa, mantissa) / _POWERS[np.minimum(fraction, len(_POWERS) - 1)]
+    value[length == 0] = np.nan
+    return line, a[words], value
+
+
+def _forward_fill(values, initial=np.nan):
+    index = np.where(np.isnan(values), 0, np.arange(len(values)))
+    np.maximum.accumulate(index, out=index)
+    filled = values[index]
+    filled[np.isnan(filled)] = initial
+    return filled
+
+
+def parse_gcode(data):
+    """
+    Read a G-code program (bytes or str) back into arrays. Words are
+    parsed chunk by chunk with parse_words() and spread into one column
+    per letter; modal X/Y/Z/F are forward-filled over the G0/G1 moves.
+    E is tracked in absolute (M82) and relative (M83) mode, with G92 E
+    resets, and returned as the running total so both modes compare
+    equal. Arcs and relative positioning (G91) are not interpreted.
+
+    Returns a Toolpath of the G0/G1 moves, flagging G0 in `travel`, and
+    the 1-based line number of every move.
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    lines, letters, values = [], [], []
+    n_lines = 0
+    start = 0
+    while start < len(data):
+        stop = len(data)
+        if start + CHUNK_BYTES < stop:
+            # Cut after the last whole line of the chunk
+            cut = data.rfind(b"\n", start, start + CHUNK_BYTES)
+            stop = cut + 1 if cut >= start else (data.find(b"\n", start + CHUNK_BYTES) + 1 or stop)
+        line, letter, value = parse_words(data[start:stop])
+        lines.append(line + n_lines)
+        letters.append(letter)
+        values.append(value)
+        n_lines += data.count(b"\n", start, stop)
+        start = stop
+    if data and not data.endswith(b"\n"):
+        n_lines += 1
+    line, letter, value = (np.concatenate(column) if column else np.zeros(0) for column in (lines, letters, values))
+    line = line.astype(np.int64)
+
+    # One row per letter; the first G and M word of a line set its command
+    row = _ROW[letter.astype(np.uint8)]
+    kept = np.flatnonzero(row >= 0)[::-1]
+    table = np.full((len(LETTERS), n_lines), np.nan)
+    table[row[kept], line[kept]] = value[kept]
+    columns = dict(zip(LETTERS, table))
+    G, M, E = columns["G"], columns["M"], columns["E"]
+    motion = (G == 0) | (G == 1)
+
+    # M82/M83 switch the E mode for the lines that follow
+    relative = _forward_fill(np.where(M == 83, 1.0, np.where(M == 82, 0.0, np.nan)), 0.0) > 0
+    has_e = ~np.isnan(E)
+    reset = (G == 92) & has_e
+    events = np.flatnonzero((motion & ~relative & has_e) | reset)
+    increments = np.diff(E[events], prepend=0.0)
+    increments[reset[events]] = 0.0
+    dE = np.zeros(n_lines)
+    dE[events] = increments
+    dE[motion & relative & has_e] = E[motion & relative & has_e]
+
+    index = np.flatnonzero(motion)
+    x, y, z, f = (_forward_fill(columns[name][index], 0.0 if name != "F" else np.nan) for name in "XYZF")
+    e = np.cumsum(dE[index])
+    toolpath = Toolpath.from_columns(x, y, z, e, f, travel=G[index] == 0)
+    return toolpath, index + 1
+
+
+def read_gcode(path):
+    """
+    parse_gcode() of a file.
+    """
+    with open(path, "rb") as f:
+        return parse_gcode(f.read())
@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import collections
+import os
+import time
+
+# Flow control defaults: Grbl's serial receive buffer and Marlin's command
+# buffer
+DEFAULT_RX_SIZE = 127  # characters
+DEFAULT_WINDOW = 4  # commands
+DEFAULT_TIMEOUT = 30.0  # s without a response before giving up
+DEFAULT_BAUDRATE = 115200
+
+
+def program_lines(text):
+    """
+    Commands of a G-code program ready to send: comments after ';' and
+    blank lines are dropped, and surrounding whitespace is stripped.
+    """
+    lines = []
+    for line in text.splitlines():
+        line = line.split(";", 1)[0].strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def _raw(fd, baudrate=None):
+    import termios
+    import tty
+
+    tty.setraw(fd)
+    if baudrate is not None:
+        attrs = termios.tcgetattr(fd)
+        speed = getattr(termios, f"B{baudrate}")
+        attrs[4] = attrs[5] = speed
+        termios.tcsetattr(fd, termios.TCSANOW, attrs)
+
+
+class _SerialWriter(asyncio.StreamWriter):
+    """
+    Stream writer that also closes the read side of its serial port.
+    """
+
+    def __init__(self, transport, protocol, reader, loop, read_transport):
+        super().__init__(transport, protocol, reader, loop)
+        self._read_transport = read_transport
+
+    def close(self):
+        self._read_transport.close()
+        super().close()
+
+
+async def open_serial(port, baudrate=DEFAULT_BAUDRATE):
+    """
+    Open a serial device (or pty) in raw mode as an asyncio stream pair,
+    without third-party serial libraries. Returns (reader, writer).
+    """
+    loop = asyncio.get_running_loop()
+    fd = os.open(port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    _raw(fd, baudrate)
+    reader = asyncio.StreamReader()
+    read_transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", buffering=0)
+    )
+    transport, protocol = await loop.connect_write_pipe(
+        asyncio.streams.FlowControlMixin, os.fdopen(os.dup(fd), "wb", buffering=0)
+    )
+    return reader, _SerialWriter(transport, protocol, reader, loop, read_transport)
+
+
+async def send_program(lines, reader, writer, mode="count", rx_size=DEFAULT_RX_SIZE, window=DEFAULT_WINDOW,
+                       timeout=DEFAULT_TIMEOUT):
+    """
+    Stream commands to a printer, keeping its input buffer full without
+    overflowing it.
+
+    mode "count" is Grbl-style character counting: commands are sent while
+    the characters in flight fit in `rx_size`, and every "ok" or "error"
+    frees the oldest one. mode "window" is Marlin-style: up to `window`
+    commands are in flight, each freed by its "ok".
+
+    Returns a report: commands sent, time (s), commands per second, the
+    number of times the printer was left with nothing in flight while
+    commands remained ("starved"), the largest number of commands in
+    flight, and the errors reported, as (command index, message).
+    """
+    if mode not in ("count", "window"):
+        raise ValueError(f"Unknown flow control {mode!r}, expected 'count' or 'window'")
+    payloads = [(line + "\n").encode() for line in lines]
+    in_flight = collections.deque()
+    in_flight_chars = 0
+    sent = 0
+    starved = 0
+    most = 0
+    errors = []
+    start = time.perf_counter()
+    while sent < len(payloads) or in_flight:
+        batch = []
+        while sent < len(payloads):
+            size = len(payloads[sent])
+            if mode == "count" and in_flight and in_flight_chars + size > rx_size:
+                break
+            if mode == "window" and len(in_flight) >= window:
+                break
+            batch.append(payloads[sent])
+            in_flight.append((sent, size))
+            in_flight_chars += size
+            sent += 1
+        if batch:
+            writer.write(b"".join(batch))
+            await writer.drain()
+            most = max(most, len(in_flight))
+
+        response = (await asyncio.wait_for(reader.readline(), timeout)).decode(errors="replace").strip()
+        if not response:
+            continue
+        done = response.lower().startswith("ok")
+        if response.lower().startswith("error"):
+            errors.append((in_flight[0][0] if in_flight else sent, response))
+            done = mode == "count"
+        if done and in_flight:
+            _, size = in_flight.popleft()
+            in_flight_chars -= size
+            if not in_flight and sent < len(payloads):
+                starved += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "commands": sent,
+        "time": elapsed,
+        "commands_per_s": sent / elapsed if elapsed > 0 else float("inf"),
+        "starved": starved,
+        "max_in_flight": most,
+        "errors": errors,
+    }
+
+
+async def send_to_port(lines, port, baudrate=DEFAULT_BAUDRATE, **options):
+    """
+    Open `port`, stream the commands with send_program() and close it.
+    """
+    reader, writer = await open_serial(port, baudrate)
+    try:
+        report = await send_program(lines, reader, writer, **options)
+    finally:
+        writer.close()
+    return dict(report, port=port)
+
+
+async def send_many(jobs, baudrate=DEFAULT_BAUDRATE, **options):
+    """
+    Drive several printers at once from one event loop. `jobs` is a list
+    of (commands, port) pairs; returns one report per job, in order.
+    """
+    return await asyncio.gather(*(send_to_port(lines, port, baudrate, **options) for lines, port in jobs))
+
+
+class VirtualPrinter:
+    """
+    A printer stand-in on a pseudo-terminal, for testing senders without
+    hardware. Commands arrive in a receive buffer of `rx_size`
+    characters (Grbl) or, with `window`, of that many commands (Marlin),
+    move into a planner queue of `planner_size` commands (each answered
+    with "ok" as it is queued) and are executed one every `move_time`
+    seconds. The printer records every command it received, receive-buffer
+    overflows (a sender breaking flow control) and planner starvation: the
+    queue running dry between commands of a job. Unknown commands are
+    answered "error:..." in place of "ok", or followed by "ok" in
+    `window` mode.
+
+    Use as `async with VirtualPrinter() as printer:` and send to
+    `printer.port`.
+    """
+
+    def __init__(self, rx_size=DEFAULT_RX_SIZE, planner_size=16, move_time=0.0, window=None):
+        self.rx_size = rx_size
+        self.window = window
+        self.planner_size = planner_size
+        self.move_time = move_time
+        self.received = []
+        self.executed = 0
+        self.overflows = 0
+        self.starved = 0
+        self.port = None
+        self._master = None
+        self._slave = None
+        self._partial = b""
+        self._rx = collections.deque()
+        self._rx_chars = 0
+        self._planner = asyncio.Queue()
+        self._executor = None
+        self._idle = True
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        self._master, self._slave = os.openpty()
+        _raw(self._slave)
+        os.set_blocking(self._master, False)
+        self.port = os.ttyname(self._slave)
+        asyncio.get_running_loop().add_reader(self._master, self._on_data)
+        self._executor = asyncio.ensure_future(self._execute())
+
+    async def close(self):
+        asyncio.get_running_loop().remove_reader(self._master)
+        self._executor.cancel()
+        try:
+            await self._executor
+        except asyncio.CancelledError:
+            pass
+        os.close(self._master)
+        os.close(self._slave)
+
+    def _on_data(self):
+        try:
+            data = os.read(self._master, 65536)
+        except (BlockingIOError, OSError):
+            return
+        *lines, self._partial = (self._partial + data).split(b"\n")
+        for line in lines:
+            self._rx.append(line)
+            self._rx_chars += len(line) + 1
+        if (len(self._rx) > self.window) if self.window else (self._rx_chars > self.rx_size):
+            self.overflows += 1
+        self._parse()
+
+    def _parse(self):
+        # Move commands from the receive buffer into free planner slots
+        while self._rx and self._planner.qsize() < self.planner_size:
+            line = self._rx.popleft()
+            self._rx_chars -= len(line) + 1
+            command = line.decode(errors="replace").strip()
+            self.received.append(command)
+            if command[:1] in ("G", "M"):
+                if self._idle and self.executed:
+                    self.starved += 1
+                self._planner.put_nowait(command)
+                os.write(self._master, b"ok\n")
+            else:
+                reply = f"error:unsupported command {command!r}\n"
+                os.write(self._master, (reply + "ok\n" if self.window else reply).encode())
+
+    async def finish(self):
+        """
+        Wait until every command received so far has been executed.
+        """
+        while self._rx or not self._planner.empty() or not self._idle:
+            await asyncio.sleep(max(self.move_time, 1e-3))
+
+    async def _execute(self):
+        while True:
+            try:
+                self._planner.get_nowait()
+            except asyncio.QueueEmpty:
+                self._idle = True
+                await self._planner.get()
+            self._idle = False
+            await asyncio.sleep(self.move_time)
+            self.executed += 1
+            self._parse()
+
+
+async def _run(lines, ports, baudrate, options, virtual=0, move_time=0.0):
+    if not virtual:
+        return await send_many([(lines, port) for port in ports], baudrate, **options), []
+    window = options["window"] if options["mode"] == "window" else None
+    printers = [VirtualPrinter(options["rx_size"], move_time=move_time, window=window) for _ in range(virtual)]
+    for printer in printers:
+        await printer.start()
+    try:
+        reports = await send_many([(lines, printer.port) for printer in printers], None, **options)
+        await asyncio.gather(*(printer.finish() for printer in printers))
+    finally:
+        for printer in printers:
+            await printer.close()
+    return reports, printers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a G-code program to one or more printers.")
+    parser.add_argument("program", help="G-code file")
+    parser.add_argument("-p", "--port", action="append", default=[], help="serial port (repeatable, one job each)")
+    parser.add_argument("-b", "--baudrate", type=int, default=DEFAULT_BAUDRATE, help="serial speed")
+    parser.add_argument("--mode", choices=("count", "window"), default="count",
+                        help="character counting (Grbl) or ok window (Marlin) flow control")
+    parser.add_argument("--rx-size", type=int, default=DEFAULT_RX_SIZE, help="printer receive buffer (characters)")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="commands in flight in window mode")
+    parser.add_argument("--virtual", type=int, metavar="N", help="send to N simulated printers instead of ports")
+    parser.add_argument("--move-time", type=float, default=0.0, help="simulated time per command (s)")
+    args = parser.parse_args(argv)
+
+    with open(args.program) as f:
+        lines = program_lines(f.read())
+    if not (args.port or args.virtual):
+        parser.error("give at least one --port, or --virtual N")
+    options = dict(mode=args.mode, rx_size=args.rx_size, window=args.window)
+    reports, printers = asyncio.run(
+        _run(lines, args.port, args.baudrate, options, args.virtual or 0, args.move_time)
+    )
+    for i, report in enumerate(reports):
+        print(f"{report['port']}: {report['commands']} commands in {report['time']:.2f} s "
+              f"({report['commands_per_s']:.0f} cmd/s), {report['starved']} starved, "
+              f"{len(report['errors'])} errors")
+        if printers:
+            printer = printers[i]
+            ok = printer.received == lines
+            print(f"  printer: {printer.executed} executed, {printer.starved} planner starvations, "
+                  f"{printer.overflows} overflows, program {'intact' if ok else 'CORRUPTED'}")
+
+
+if __name__ == "__main__":
+    main()
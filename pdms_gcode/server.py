@@ -0,0 +1,438 @@
+import argparse
+import asyncio
+import collections
+import io
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+
+from .cache import KEY_PARAMETERS, program_key
+from .rheology import calculate_extrusion_speed, calculate_flow_rate
+from .toolpath import generate_toolpath
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Results kept in memory before the least recently used are dropped
+DEFAULT_CACHE_BYTES = 256 << 20
+# Largest request body accepted
+MAX_BODY = 1 << 16
+# G-code responses are streamed in chunks of this size
+STREAM_CHUNK = 1 << 16
+
+
+def _program(params):
+    R = params["D"] / 2
+    v = calculate_extrusion_speed(calculate_flow_rate(params["Gamma"], params["D"], params["n"]), R)
+    return generate_toolpath(params["deltax"], params["deltay"], params["u1"], params["u2"], params["u3"], R, v)
+
+
+def render_gcode(params, color_by=None):
+    """
+    The three-square program of a parameter set, as bytes.
+    """
+    return _program(params).gcode().encode()
+
+
+def render_toolpath(params, color_by=None):
+    """
+    The toolpath columns (X, Y, Z, E, F rows) and square offsets of a
+    parameter set, as an .npz archive holding "toolpath" and "squares".
+    """
+    toolpath = _program(params)
+    buffer = io.BytesIO()
+    np.savez(buffer, toolpath=toolpath.data, squares=toolpath.squares)
+    return buffer.getvalue()
+
+
+def render_png(params, color_by="layer"):
+    """
+    A PNG preview of a parameter set, coloured by layer or feed rate.
+    """
+    from .preview import render_preview
+
+    toolpath = _program(params)
+    buffer = io.BytesIO()
+    render_preview(toolpath.x, toolpath.y, buffer, z=toolpath.z, f=toolpath.f, color_by=color_by)
+    return buffer.getvalue()
+
+
+# Endpoint: renderer and content type
+RENDERERS = {
+    "/gcode": (render_gcode, "text/plain; charset=utf-8"),
+    "/toolpath": (render_toolpath, "application/octet-stream"),
+    "/preview": (render_png, "image/png"),
+}
+
+
+def _warm_up():
+    # Pay the imports of a worker once, at startup rather than on a request;
+    # matplotlib is optional (the plot extra) and only needed by /preview
+    try:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: F401
+    except ImportError:
+        pass
+
+    return os.getpid()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_request_params(body):
+    """
+    The parameter set and preview colouring of a JSON request body: an
+    object holding every key of KEY_PARAMETERS as a finite positive
+    number, and optionally "color_by" ("layer" or "feed").
+    """
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError as e:
+        raise HTTPError(400, f"Invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Expected a JSON object of parameters")
+    missing = [name for name in KEY_PARAMETERS if name not in data]
+    if missing:
+        raise HTTPError(400, f"Parameter set is missing {', '.join(missing)}")
+    params = {}
+    for name in KEY_PARAMETERS:
+        try:
+            params[name] = float(data[name])
+        except (TypeError, ValueError):
+            raise HTTPError(400, f"{name} must be a number, got {data[name]!r}")
+        if not math.isfinite(params[name]):
+            raise HTTPError(400, f"{name} must be finite")
+        # Zero or negative values give NaN or meaningless programs
+        if params[name] <= 0:
+            raise HTTPError(400, f"{name} must be positive, got {data[name]!r}")
+    color_by = data.get("color_by", "layer")
+    if color_by not in ("layer", "feed"):
+        raise HTTPError(400, f"Unknown color_by {color_by!r}, expected 'layer' or 'feed'")
+    return params, color_by
+
+
+async def _read_request(reader):
+    """
+    Method, path, headers and body of the next HTTP/1.1 request on a
+    connection, or None once the client has closed it.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413, f"Request body over {MAX_BODY} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method, target.split("?", 1)[0], headers, body
+
+
+def _head(status, content_type, extra=()):
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}", *extra]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send(writer, status, body, content_type="application/json"):
+    writer.write(_head(status, content_type, [f"Content-Length: {len(body)}"]) + body)
+    await writer.drain()
+
+
+async def _stream(writer, body, content_type):
+    """
+    Send `body` with chunked transfer encoding, waiting for the client to
+    take every chunk so slow readers do not pile up buffers.
+    """
+    writer.write(_head(200, content_type, ["Transfer-Encoding: chunked"]))
+    view = memoryview(body)
+    for i in range(0, len(body), STREAM_CHUNK):
+        chunk = view[i:i + STREAM_CHUNK]
+        writer.write(b"%x\r\n" % len(chunk) + chunk + b"\r\n")
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+class GenerationServer:
+    """
+    A local HTTP service around the generator. POST a JSON parameter set
+    (see parse_request_params) to /gcode for the program (streamed),
+    /toolpath for the toolpath arrays (.npz) or /preview for a PNG;
+    GET /stats returns the counters below.
+
+    Generation runs on a pool of `workers` processes, so the event loop
+    only parses requests and writes responses. Results are kept in an
+    in-memory LRU cache of up to `cache_bytes`, keyed by endpoint and
+    program_key(), and concurrent requests for a result still being
+    generated wait on the same job instead of starting their own.
+    """
+
+    def __init__(self, workers=None, cache_bytes=DEFAULT_CACHE_BYTES):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_bytes = cache_bytes
+        self.stats = {"requests": 0, "hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "cached_bytes": 0}
+        self._cache = collections.OrderedDict()
+        self._pending = {}
+        self._pool = None
+        self._server = None
+        self._connections = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Start the worker pool and listen on `host`:`port` (0 picks a free
+        port). Returns the bound (host, port).
+        """
+        loop = asyncio.get_running_loop()
+        self._pool = ProcessPoolExecutor(self.workers)
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _warm_up) for _ in range(self.workers)))
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # Hang up idle keep-alive connections and let their handlers finish
+            for writer in list(self._connections.values()):
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    async def result(self, path, params, color_by="layer"):
+        """
+        The response body of an endpoint for a parameter set: from the
+        cache, from the job already generating it, or from a new job.
+        """
+        key = (path, program_key(params), color_by if path == "/preview" else None)
+        body = self._cache.get(key)
+        if body is not None:
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return body
+        job = self._pending.get(key)
+        if job is None:
+            self.stats["misses"] += 1
+            job = self._pending[key] = asyncio.ensure_future(self._generate(key, path, params, color_by))
+        else:
+            self.stats["coalesced"] += 1
+        # Shielded, so a client hanging up does not cancel the job for the others
+        return await asyncio.shield(job)
+
+    async def _generate(self, key, path, params, color_by):
+        render = RENDERERS[path][0]
+        try:
+            body = await asyncio.get_running_loop().run_in_executor(self._pool, render, params, color_by)
+        finally:
+            del self._pending[key]
+        self._cache[key] = body
+        self.stats["cached_bytes"] += len(body)
+        while self.stats["cached_bytes"] > self.cache_bytes and self._cache:
+            _, dropped = self._cache.popitem(last=False)
+            self.stats["cached_bytes"] -= len(dropped)
+        return body
+
+    async def _respond(self, method, path, body, writer):
+        if path == "/stats":
+            if method != "GET":
+                raise HTTPError(405, "Use GET for /stats")
+            stats = dict(self.stats, cached_entries=len(self._cache), in_flight=len(self._pending))
+            await _send(writer, 200, json.dumps(stats).encode())
+            return
+        if path not in RENDERERS:
+            raise HTTPError(404, f"No endpoint {path}, expected /stats or one of {', '.join(RENDERERS)}")
+        if method != "POST":
+            raise HTTPError(405, f"POST a JSON parameter set to {path}")
+        params, color_by = parse_request_params(body)
+        try:
+            result = await self.result(path, params, color_by)
+        except ImportError as e:
+            raise HTTPError(501, f"{path} needs matplotlib (the plot extra): {e}")
+        except Exception as e:
+            raise HTTPError(500, f"Generation failed: {e!r}")
+        if path == "/gcode":
+            await _stream(writer, result, RENDERERS[path][1])
+        else:
+            await _send(writer, 200, result, RENDERERS[path][1])
+
+    async def _error(self, writer, error):
+        self.stats["errors"] += 1
+        await _send(writer, error.status, json.dumps({"error": str(error)}).encode())
+
+    async def _handle(self, reader, writer):
+        self._connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as e:
+                    # The rest of the stream cannot be trusted after a bad request
+                    await self._error(writer, e)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                self.stats["requests"] += 1
+                try:
+                    await self._respond(method, path, body, writer)
+                except HTTPError as e:
+                    await self._error(writer, e)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self._connections[asyncio.current_task()]
+            writer.close()
+
+
+async def _read_response(reader):
+    """
+    Status and body of an HTTP response, with or without chunked
+    transfer encoding.
+    """
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding") == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            chunk = await reader.readexactly(size + 2)
+            if not size:
+                break
+            chunks.append(chunk[:-2])
+        return status, b"".join(chunks)
+    return status, await reader.readexactly(int(headers.get("content-length", 0)))
+
+
+async def request(reader, writer, path, payload=None):
+    """
+    One request on an open keep-alive connection: POST `payload` as JSON,
+    or GET without one. Returns the status and body.
+    """
+    body = b"" if payload is None else json.dumps(payload).encode()
+    method = "GET" if payload is None else "POST"
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    return await _read_response(reader)
+
+
+async def load_test(grid, host=DEFAULT_HOST, port=DEFAULT_PORT, path="/gcode", concurrency=16, requests=None):
+    """
+    Send the parameter sets of `grid` (repeated up to `requests` in
+    total) to a running server over `concurrency` keep-alive connections.
+    Returns requests, errors, bytes received, time (s), requests per
+    second and latency percentiles (s).
+    """
+    requests = len(grid) if requests is None else requests
+    queue = collections.deque(grid[i % len(grid)] for i in range(requests))
+    latencies = []
+    errors = 0
+    received = 0
+
+    async def client():
+        nonlocal errors, received
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while queue:
+                payload = queue.popleft()
+                start = time.perf_counter()
+                status, body = await request(reader, writer, path, payload)
+                latencies.append(time.perf_counter() - start)
+                errors += status != 200
+                received += len(body)
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0.0, 0.0, 0.0)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "bytes": received,
+        "time": elapsed,
+        "requests_per_s": len(latencies) / elapsed if elapsed > 0 else float("inf"),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "max": max(latencies, default=0.0),
+    }
+
+
+async def _serve(host, port, workers, cache_bytes):
+    async with GenerationServer(workers, cache_bytes) as server:
+        host, port = await server.start(host, port)
+        print(f"Serving on http://{host}:{port} with {server.workers} workers", flush=True)
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve G-code, toolpaths and previews over local HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on (or to load-test)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (or to load-test)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_CACHE_BYTES / 2 ** 20,
+                        help="in-memory result cache (MB)")
+    parser.add_argument("--load-test", metavar="GRID", help="instead of serving, send a CSV/JSON grid to a server")
+    parser.add_argument("--endpoint", choices=sorted(RENDERERS), default="/gcode", help="endpoint to load-test")
+    parser.add_argument("--concurrency", type=int, default=16, help="load-test connections")
+    parser.add_argument("--requests", type=int, help="load-test requests (default: one per grid row)")
+    args = parser.parse_args(argv)
+
+    if args.load_test:
+        from .batch import load_grid
+
+        report = asyncio.run(load_test(
+            load_grid(args.load_test), args.host, args.port, args.endpoint, args.concurrency, args.requests
+        ))
+        print(f"{report['requests']} requests in {report['time']:.2f} s ({report['requests_per_s']:.1f}/s), "
+              f"{report['errors']} errors, {report['bytes'] / 2 ** 20:.1f} MB")
+        print(f"Latency p50= {report['p50'] * 1e3:.1f} ms, p95= {report['p95'] * 1e3:.1f} ms, "
+              f"p99= {report['p99'] * 1e3:.1f} ms, max= {report['max'] * 1e3:.1f} ms")
+        return
+    try:
+        asyncio.run(_serve(args.host, args.port, args.workers, int(args.cache_size * 2 ** 20)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,518 @@
+import math
+
+import numpy as np
+
+from .profiling import stage
+
+AXES = ("X", "Y", "Z", "E", "F")
+
+# Decimal places per axis for modal output
+DEFAULT_PRECISION = {"X": 3, "Y": 3, "Z": 3, "E": 5, "F": 0}
+
+# Feed rate of non-extruding G0 travel (mm/min)
+DEFAULT_TRAVEL_FEED = 3000.0
+
+# Bump whenever the generated programs change, so cached ones are not reused
+GENERATOR_VERSION = 1
+
+
+def calculate_extrusion(prev_E, delta, u, R, v):
+    """
+    Calculate the extrusion value E based on the provided formula.
+    E_new = E_previous + 3.87 * (delta / u) * R^2 * v / 4
+    Works element-wise when delta/u are NumPy arrays.
+    """
+    E_new = prev_E + (3.87 * (delta / u) * math.pi * (R ** 2) * v)/30
+    return E_new
+
+
+def segment_lengths(x, y):
+    """
+    Length of every move between consecutive vertices (mm).
+    """
+    return np.hypot(np.diff(x), np.diff(y))
+
+
+def cumulative_extrusion(lengths, feed, R, v, E0=0.0):
+    """
+    Running E total from one np.cumsum of the calculate_extrusion
+    increments. `lengths[i]` is the move ending at vertex i; the result
+    has one leading entry holding `E0`.
+    """
+    increments = calculate_extrusion(0.0, np.asarray(lengths, dtype=float), feed, R, v)
+    return np.cumsum(np.concatenate(([E0], increments)))
+
+
+def extrusion_column(lengths, feed, R, v, hold=None, E0=0.0):
+    """
+    E printed on every vertex, continuing from `E0`. Moves flagged in
+    `hold` keep the previous E on their line but their increment still
+    counts towards the following moves.
+    """
+    E = cumulative_extrusion(lengths, feed, R, v, E0)
+    if hold is not None and hold.any():
+        return np.where(hold, E[:-1], E[1:])
+    return E[1:]
+
+
+def serpentine(x_near, x_far, deltay, rows, layer_rows, layer_height):
+    """
+    Vertices of one serpentine square, starting with the move from the
+    near edge to the far edge at Y=0 and ending on the near edge at
+    Y = rows*deltay. Z steps up by `layer_height` on the X move of every
+    row listed in `layer_rows`.
+    """
+    i = np.arange(2 * rows)
+    y = ((i + 1) // 2) * deltay
+    x = np.where((i // 2) % 2 == 0, x_far, x_near)
+    z = np.searchsorted(np.asarray(layer_rows), i // 2, side="right") * layer_height
+    return x.astype(float), y.astype(float), z.astype(float)
+
+
+def three_square_blocks(deltax, deltay, u1, u2, u3):
+    """
+    The original three-square program (squares 123, 456 and 789), one
+    block of vertex arrays per square. Each block holds X, Y, Z and feed
+    rate per vertex, the nominal length the move into each vertex is
+    metered with and the moves that keep the previous E value.
+    """
+    rows = 14
+    top = rows * deltay
+    feeds = (u1, u2, u3)
+    # Metered length of the move back down to Y=0 after each square
+    return_delta = (deltay, deltax)
+
+    for k, u in enumerate(feeds):
+        x_near = k * (20 + deltax)
+        x_far = x_near + deltax
+        x, y, z = serpentine(x_near, x_far, deltay, rows, (4, 9), 2)
+        delta = np.where(np.arange(2 * rows) % 2 == 0, deltax, deltay)
+        hold = np.zeros(2 * rows, dtype=bool)
+        if k == 0:
+            # Program starts at the origin
+            x, y, z = np.append(0.0, x), np.append(0.0, y), np.append(0.0, z)
+            delta = np.append(0.0, delta)
+            hold = np.append(False, hold)
+        if k < len(feeds) - 1:
+            # Move out to the transition lane, then back down to Y=0
+            x = np.append(x, [x_far + 10, x_far + 10])
+            y = np.append(y, [top, 0.0])
+            z = np.append(z, [z[-1], 0.0])
+            delta = np.append(delta, [deltax, return_delta[k]])
+            hold = np.append(hold, [False, True])
+        else:
+            # Last move lifts the nozzle clear of the print
+            x = np.append(x, x_far)
+            y = np.append(y, top)
+            z = np.append(z, 30.0)
+            delta = np.append(delta, deltax)
+            hold = np.append(hold, True)
+        yield x, y, z, np.full(len(x), float(u)), delta, hold
+
+
+def three_square_layout(deltax, deltay, u1, u2, u3):
+    """
+    The original three-square program as whole-program arrays.
+    """
+    blocks = list(three_square_blocks(deltax, deltay, u1, u2, u3))
+    return tuple(np.concatenate(column) for column in zip(*blocks))
+
+
+def _specimen_template(deltax, deltay, rows, layer_rows, layers, layer_height):
+    """
+    X, Y, Z of one lattice specimen relative to its origin (the near
+    corner at Y=0, then the serpentine) and the metered length of every
+    vertex, including the two travel vertices that follow it.
+    """
+    if layer_rows is None:
+        layer_rows = np.linspace(0, rows, layers + 1)[1:-1].round().astype(int)
+    tx, ty, tz = serpentine(0.0, deltax, deltay, rows, layer_rows, layer_height)
+    tx, ty, tz = np.append(0.0, tx), np.append(0.0, ty), np.append(0.0, tz)
+    # Metered lengths are the same for every specimen; travel is not metered
+    lengths = np.concatenate(([0.0], segment_lengths(tx, ty), [0.0, 0.0]))
+    return tx, ty, tz, lengths
+
+
+def _lattice_counts(speeds, specimens, columns):
+    """
+    Speeds as an array plus the specimen and column counts, defaulting to
+    one specimen per speed in a single row.
+    """
+    speeds = np.atleast_1d(np.asarray(speeds, dtype=float))
+    specimens = len(speeds) if specimens is None else specimens
+    columns = specimens if columns is None else columns
+    if specimens < 1 or columns < 1:
+        raise ValueError(f"A bed needs at least one specimen and one column, got {specimens} and {columns}")
+    return speeds, specimens, columns
+
+
+def _specimen_origins(i, deltax, deltay, rows, columns, spacing, origin):
+    """
+    Bed position of specimen(s) `i` on a grid of `columns` per row.
+    """
+    return origin[0] + (i % columns) * (deltax + spacing[0]), origin[1] + (i // columns) * (rows * deltay + spacing[1])
+
+
+def lattice_layout(deltax, deltay, speeds, specimens=None, rows=14, layer_rows=None, layers=3,
+                   layer_height=2.0, columns=None, spacing=(20.0, 20.0), origin=(0.0, 0.0), lift=30.0, hop=2.0,
+                   travel_feed=DEFAULT_TRAVEL_FEED):
+    """
+    A bed of serpentine specimens as whole-program arrays, built in one
+    vectorised pass: a single serpentine template is broadcast over every
+    specimen origin, so the cost is linear in the number of moves.
+
+    Specimen i is printed at speeds[i] (the list is repeated when shorter
+    than `specimens`) and placed on a grid of `columns` specimens per row,
+    `spacing` mm apart in X and Y. Within a specimen Z steps up by
+    `layer_height` at every row in `layer_rows`, by default `layers` even
+    bands. The moves between specimens keep the previous E: the nozzle
+    rises to `hop` mm above the top layer, moves over to the next entry
+    and comes straight down, so it never crosses a printed specimen. The
+    program ends by lifting to Z=`lift`. These held moves are travel,
+    written as G0 at `travel_feed`.
+
+    Returns X, Y, Z, feed rate, metered length and hold flag per vertex
+    (printing moves are metered by their geometric length, travel by
+    zero) plus the vertex offset of every specimen.
+    """
+    speeds, specimens, columns = _lattice_counts(speeds, specimens, columns)
+    tx, ty, tz, lengths = _specimen_template(deltax, deltay, rows, layer_rows, layers, layer_height)
+    ox, oy = _specimen_origins(np.arange(specimens), deltax, deltay, rows, columns, spacing, origin)
+
+    # Every specimen is followed by two travel vertices: above its exit,
+    # then above the next entry (the last one's are dropped below)
+    n = len(tx) + 2
+    x, y, z = np.empty((specimens, n)), np.empty((specimens, n)), np.empty((specimens, n))
+    x[:, :-2], y[:, :-2], z[:, :-2] = ox[:, None] + tx, oy[:, None] + ty, tz
+    x[:, -2], y[:, -2] = ox + tx[-1], oy + ty[-1]
+    x[:, -1], y[:, -1] = np.append(ox[1:], x[-1, -2]), np.append(oy[1:], y[-1, -2])
+    z[:, -2:] = tz.max() + hop
+    hold = np.zeros((specimens, n), dtype=bool)
+    hold[:, -2:] = True
+    hold[1:, 0] = True  # down onto the entry
+
+    # The last specimen lifts clear of the bed instead
+    end = specimens * n - 1
+    x, y, z, hold = x.ravel()[:end], y.ravel()[:end], z.ravel()[:end], hold.ravel()[:end]
+    z[-1] = lift
+    f = np.where(hold, travel_feed, np.repeat(np.resize(speeds, specimens), n)[:end])
+    lengths = np.tile(lengths, specimens)[:end]
+    squares = np.append(np.arange(specimens) * n, end)
+    return x, y, z, f, lengths, hold, squares
+
+
+def lattice_blocks(deltax, deltay, speeds, specimens=None, rows=14, layer_rows=None, layers=3,
+                   layer_height=2.0, columns=None, spacing=(20.0, 20.0), origin=(0.0, 0.0), lift=30.0, hop=2.0,
+                   travel_feed=DEFAULT_TRAVEL_FEED):
+    """
+    lattice_layout() as one block of vertex arrays per specimen, for
+    stream_gcode() and Toolpath.from_blocks(). Each block is built from
+    the template when it is requested, so streaming a bed holds one
+    specimen at a time whatever its size. Blocks carry a seventh array
+    flagging their travel (the held moves) as G0. The metered lengths and
+    flags are shared between blocks and must not be modified.
+    """
+    speeds, specimens, columns = _lattice_counts(speeds, specimens, columns)
+    tx, ty, tz, lengths = _specimen_template(deltax, deltay, rows, layer_rows, layers, layer_height)
+    top = tz.max() + hop
+    n = len(tx) + 2
+    hold = np.zeros(n, dtype=bool)
+    hold[-2:] = True
+    entered = hold.copy()
+    entered[0] = True  # down onto the entry
+
+    # Checked and built on the call, the blocks themselves on demand
+    def blocks():
+        ox, oy = _specimen_origins(0, deltax, deltay, rows, columns, spacing, origin)
+        for k in range(specimens):
+            x, y, z = np.empty(n), np.empty(n), np.empty(n)
+            x[:-2], y[:-2], z[:-2] = ox + tx, oy + ty, tz
+            x[-2], y[-2], z[-2:] = ox + tx[-1], oy + ty[-1], top
+            if k + 1 < specimens:
+                ox, oy = _specimen_origins(k + 1, deltax, deltay, rows, columns, spacing, origin)
+                x[-1], y[-1], end = ox, oy, n
+            else:
+                # The last specimen lifts clear of the bed instead
+                z[-2], end = lift, n - 1
+            travel = (entered if k else hold)[:end]
+            f = np.where(travel, travel_feed, speeds[k % len(speeds)])
+            yield x[:end], y[:end], z[:end], f, lengths[:end], travel, travel
+
+    return blocks()
+
+
+def build_toolpath(x, y, z, f, R, v, lengths=None, hold=None):
+    """
+    Extrusion column for a toolpath given as vertex arrays. Moves are
+    metered by their geometric length unless `lengths` is given.
+    """
+    if lengths is None:
+        lengths = np.concatenate(([0.0], segment_lengths(x, y)))
+    return extrusion_column(lengths, f, R, v, hold)
+
+
+@stage("format_gcode")
+def format_gcode(x, y, z, E, f, travel=None):
+    """
+    Format vertex arrays as G1 lines. Vertices flagged in `travel` are
+    reached with non-extruding G0 moves instead.
+    """
+    if travel is None or not travel.any():
+        return "\n".join(
+            f"G1 X{xi} Y{yi} Z{zi:g} E{ei:.5f} F{fi}"
+            for xi, yi, zi, ei, fi in zip(x.tolist(), y.tolist(), z.tolist(), E.tolist(), f.tolist())
+        )
+    return "\n".join(
+        f"G0 X{xi} Y{yi} Z{zi:g} F{fi}" if ti else f"G1 X{xi} Y{yi} Z{zi:g} E{ei:.5f} F{fi}"
+        for xi, yi, zi, ei, fi, ti in zip(x.tolist(), y.tolist(), z.tolist(), E.tolist(), f.tolist(), travel.tolist())
+    )
+
+
+def relative_extrusion(E, digits=5, E0=0.0):
+    """
+    Per-move E increments for relative extrusion (M83). They are taken
+    between the absolute values rounded to `digits` decimals, so the
+    printed increments add up to the absolute total without drift. `E0`
+    is the absolute E printed before the first vertex.
+    """
+    scale = 10.0 ** digits
+    rounded = np.rint(np.concatenate(([E0], E)) * scale)
+    return np.diff(rounded) / scale
+
+
+def collinear_mask(x, y, z, E, f, tol=1e-9):
+    """
+    Vertices to keep when merging runs of collinear moves. An interior
+    vertex is dropped when the moves on either side of it run in the same
+    direction along the same line, at the same Z and feed rate and with
+    the same extrusion per mm, so one command can replace both.
+    """
+    keep = np.ones(len(x), dtype=bool)
+    if len(x) < 3:
+        return keep
+    dx, dy, dE = np.diff(x), np.diff(y), np.diff(E)
+    L = np.hypot(dx, dy)
+    L1, L2 = L[:-1], L[1:]
+    cross = dx[:-1] * dy[1:] - dy[:-1] * dx[1:]
+    dot = dx[:-1] * dx[1:] + dy[:-1] * dy[1:]
+    rate = dE[:-1] * L2 - dE[1:] * L1
+    mergeable = (
+        (np.abs(cross) <= tol * L1 * L2)
+        & (dot > 0)
+        & (z[:-2] == z[1:-1]) & (z[1:-1] == z[2:])
+        & (f[1:-1] == f[2:])
+        & (np.abs(rate) <= tol * np.maximum(np.abs(dE[:-1] * L2), 1e-12))
+    )
+    keep[1:-1] = ~mergeable
+    return keep
+
+
+@stage("format_modal")
+def format_modal(x, y, z, E, f, precision=None, state=None, relative=False, travel=None):
+    """
+    Format vertex arrays as G1 lines that only carry the words whose
+    printed value changed since the previous line; lines that change
+    nothing are dropped. Values are rounded to `precision` decimals per
+    axis and the whole block is rendered with a single %-format call.
+    `state` holds the last printed value of every axis (scaled to
+    integers) so consecutive blocks continue modally; the updated state is
+    returned together with the text. With `relative` the E column holds
+    per-move increments, which are never modal: E is written whenever the
+    move extrudes. Vertices flagged in `travel` become G0 lines without E.
+    """
+    digits = dict(DEFAULT_PRECISION, **(precision or {}))
+    scale = np.array([10.0 ** digits[axis] for axis in AXES])[:, None]
+    scaled = np.rint(np.vstack((x, y, z, E, f)) * scale)
+    if len(x) == 0:
+        return "", state
+
+    previous = np.full((5, 1), np.nan) if state is None else np.asarray(state, dtype=float)[:, None]
+    changed = np.empty(scaled.shape, dtype=bool)
+    changed[:, :1] = scaled[:, :1] != previous
+    changed[:, 1:] = scaled[:, 1:] != scaled[:, :-1]
+    if relative:
+        changed[3] = scaled[3] != 0
+    if travel is not None:
+        changed[3] &= ~travel
+
+    # One line template per combination of words present, G1 then G0
+    templates = np.array([
+        ("G0" if code >> 5 else "G1")
+        + "".join(f" {axis}%.{digits[axis]}f" for i, axis in enumerate(AXES) if code >> i & 1) + "\n"
+        for code in range(64)
+    ])
+    templates[[0, 32]] = ""
+    codes = (changed * (1 << np.arange(5))[:, None]).sum(axis=0)
+    if travel is not None:
+        codes = codes + 32 * travel
+    values = (scaled / scale).T[changed.T]
+    text = "".join(templates[codes].tolist()) % tuple(values.tolist())
+    return text[:-1], scaled[:, -1]
+
+
+class Toolpath:
+    """
+    A toolpath stored column-wise: one contiguous float64 row per X, Y, Z,
+    E and F in a single (5, n) array. Slicing returns views, so squares and
+    layers can be analysed without copying. `squares` holds the vertex
+    offsets where each square (block) starts, plus the end. `travel`
+    optionally flags the vertices reached by non-extruding G0 moves.
+    """
+    __slots__ = ("data", "squares", "travel")
+
+    COLUMNS = ("x", "y", "z", "e", "f")
+
+    def __init__(self, data, squares=None, travel=None):
+        self.data = data
+        self.squares = np.array([0, data.shape[1]]) if squares is None else np.asarray(squares)
+        self.travel = travel
+
+    @classmethod
+    def from_columns(cls, x, y, z, e, f, squares=None, travel=None):
+        data = np.empty((5, len(x)))
+        data[0], data[1], data[2], data[3], data[4] = x, y, z, e, f
+        return cls(data, squares, travel)
+
+    @classmethod
+    def from_blocks(cls, blocks, R, v):
+        """
+        Build from (x, y, z, f, lengths, hold) blocks, one block per square,
+        optionally followed by travel flags as lattice_blocks() yields.
+        """
+        blocks = list(blocks)
+        x, y, z, f, lengths, hold = (np.concatenate([block[i] for block in blocks]) for i in range(6))
+        E = build_toolpath(x, y, z, f, R, v, lengths=lengths, hold=hold)
+        squares = np.cumsum([0] + [len(block[0]) for block in blocks])
+        travel = None
+        if any(len(block) > 6 for block in blocks):
+            travel = np.concatenate([block[6] if len(block) > 6 else np.zeros(len(block[0]), dtype=bool)
+                                     for block in blocks])
+        return cls.from_columns(x, y, z, E, f, squares, travel)
+
+    x = property(lambda self: self.data[0])
+    y = property(lambda self: self.data[1])
+    z = property(lambda self: self.data[2])
+    e = property(lambda self: self.data[3])
+    f = property(lambda self: self.data[4])
+
+    def __len__(self):
+        return self.data.shape[1]
+
+    def __getitem__(self, index):
+        """
+        A view of a contiguous range of vertices.
+        """
+        if not isinstance(index, slice) or index.step not in (None, 1):
+            raise TypeError("Toolpath only supports contiguous slices")
+        return Toolpath(self.data[:, index], travel=None if self.travel is None else self.travel[index])
+
+    @property
+    def n_squares(self):
+        return len(self.squares) - 1
+
+    def square(self, k):
+        """
+        A view of the vertices of square `k`.
+        """
+        return self[self.squares[k]:self.squares[k + 1]]
+
+    def runs(self, column):
+        """
+        Views of the maximal runs of consecutive vertices sharing the same
+        value in `column` (e.g. "z" for layers, "f" for speed blocks).
+        """
+        values = getattr(self, column)
+        edges = np.concatenate(([0], np.flatnonzero(values[1:] != values[:-1]) + 1, [len(self)]))
+        return [self[a:b] for a, b in zip(edges[:-1], edges[1:])]
+
+    def layer(self, z):
+        """
+        Views of every run of vertices printed at height `z`.
+        """
+        return [run for run in self.runs("z") if run.z[0] == z]
+
+    def gcode(self, modal=False, precision=None, relative=False):
+        """
+        Program text. `modal` drops unchanged words (see format_modal);
+        `relative` writes per-move E increments after an M83 header.
+        """
+        E = self.e
+        if relative:
+            digits = dict(DEFAULT_PRECISION, **(precision or {}))["E"] if modal else 5
+            E = relative_extrusion(E, digits)
+        if modal:
+            text = format_modal(self.x, self.y, self.z, E, self.f, precision, relative=relative, travel=self.travel)[0]
+        else:
+            text = format_gcode(self.x, self.y, self.z, E, self.f, self.travel)
+        return "M83\n" + text if relative else text
+
+    def merged(self, tol=1e-9):
+        """
+        A copy with runs of collinear moves merged into single moves (see
+        collinear_mask). Square offsets are remapped to the kept vertices.
+        """
+        keep = collinear_mask(self.x, self.y, self.z, self.e, self.f, tol)
+        # Never merge across the first vertex of a square
+        keep[self.squares[:-1]] = True
+        keep[self.squares[1:-1] - 1] = True
+        travel = self.travel
+        if travel is not None:
+            # Keep both ends of every G0 move
+            keep[travel] = True
+            keep[np.flatnonzero(travel[1:])] = True
+            travel = travel[keep]
+        squares = np.concatenate(([0], np.cumsum(keep)))[self.squares]
+        return Toolpath(self.data[:, keep], squares, travel)
+
+    def coords(self):
+        """
+        (x, y) tuples as returned by the original generate_gcode.
+        """
+        return list(zip(self.x.tolist(), self.y.tolist()))
+
+    def stats(self):
+        """
+        Summary numbers for the whole path and for each square.
+        """
+        lengths = segment_lengths(self.x, self.y)
+        per_square = [
+            float(lengths[max(a - 1, 0):b - 1].sum()) for a, b in zip(self.squares[:-1], self.squares[1:])
+        ]
+        return {
+            "moves": len(self),
+            "path_length": float(lengths.sum()),
+            "square_path_lengths": per_square,
+            "extrusion": float(self.e.max()) if len(self) else 0.0,
+            "x_range": (float(self.x.min()), float(self.x.max())),
+            "y_range": (float(self.y.min()), float(self.y.max())),
+            "z_levels": np.unique(self.z).tolist(),
+            "feed_rates": np.unique(self.f).tolist(),
+        }
+
+
+@stage("generate_toolpath")
+def generate_toolpath(deltax, deltay, u1, u2, u3, R, v):
+    """
+    The three-square program as a Toolpath, one square per block.
+    """
+    return Toolpath.from_blocks(three_square_blocks(deltax, deltay, u1, u2, u3), R, v)
+
+
+@stage("generate_lattice")
+def generate_lattice(deltax, deltay, speeds, R, v, **layout):
+    """
+    A lattice_layout() bed as a Toolpath, one square per specimen, with
+    the moves between specimens flagged as travel.
+    """
+    x, y, z, f, lengths, hold, squares = lattice_layout(deltax, deltay, speeds, **layout)
+    E = build_toolpath(x, y, z, f, R, v, lengths=lengths, hold=hold)
+    return Toolpath.from_columns(x, y, z, E, f, squares, hold)
+
+
+@stage("generate_gcode")
+def generate_gcode(deltax, deltay, u1, u2, u3, R, v):
+    """
+    Generate G-code for the three specified lines.
+    """
+    toolpath = generate_toolpath(deltax, deltay, u1, u2, u3, R, v)
+    return toolpath.gcode(), toolpath.coords()
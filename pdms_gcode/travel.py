@@ -0,0 +1,183 @@
+import numpy as np
+
+from .profiling import stage
+from .toolpath import DEFAULT_TRAVEL_FEED, Toolpath, calculate_extrusion
+
+# Travel defaults; tune per machine and ink
+DEFAULT_RETRACT = 0.02  # E units pulled back before every travel
+DEFAULT_HOP = 2.0  # mm above the tallest specimen while travelling
+DEFAULT_RETRACT_FEED = 1200.0  # mm/min
+
+
+def _distances(points, targets):
+    return np.hypot(targets[..., 0] - points[..., 0], targets[..., 1] - points[..., 1])
+
+
+def nearest_neighbour(entries, exits, start, allow_reverse=False):
+    """
+    Greedy job order: from `start`, repeatedly travel to the closest
+    unvisited job. `entries` and `exits` are (n, 2) arrays of the XY
+    points where each job starts and ends; with `allow_reverse` a job may
+    also be printed backwards, entering at its exit. Every step is one
+    vectorised distance scan. Returns the order and the reversed flags.
+    """
+    n = len(entries)
+    order = np.empty(n, dtype=np.int64)
+    reverse = np.zeros(n, dtype=bool)
+    done = np.zeros(n, dtype=bool)
+    position = np.asarray(start, dtype=float)
+    for k in range(n):
+        forward = np.where(done, np.inf, _distances(position, entries))
+        j = int(np.argmin(forward))
+        if allow_reverse:
+            backward = np.where(done, np.inf, _distances(position, exits))
+            b = int(np.argmin(backward))
+            if backward[b] < forward[j]:
+                j = b
+                reverse[k] = True
+        order[k] = j
+        done[j] = True
+        position = entries[j] if reverse[k] else exits[j]
+    return order, reverse
+
+
+def _oriented(entries, exits, order, reverse):
+    first = np.where(reverse[:, None], exits[order], entries[order])
+    last = np.where(reverse[:, None], entries[order], exits[order])
+    return first, last
+
+
+def two_opt(entries, exits, start, order, reverse, allow_reverse=False, max_passes=50):
+    """
+    Improve a job order with 2-opt moves, reversing the sub-sequence i..j
+    whenever that shortens the open tour from `start`. For every i the
+    gain of all j is evaluated in one NumPy expression. When jobs may be
+    reversed the reversed sub-sequence is also printed backwards, so the
+    travel inside it is unchanged; otherwise its internal travel is
+    re-costed from prefix sums in both directions. Returns the improved
+    order and reversed flags.
+    """
+    order, reverse = order.copy(), reverse.copy()
+    start = np.asarray(start, dtype=float)
+    n = len(order)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(n - 1):
+            first, last = _oriented(entries, exits, order, reverse)
+            prev = last[i - 1] if i else start
+            j = np.arange(i + 1, n)
+            # Travel into and out of the sub-sequence, before and after
+            after = np.vstack((first[1:], [[np.nan, np.nan]]))[j]
+            old = _distances(prev, first[i]) + np.nan_to_num(_distances(last[j], after))
+            if allow_reverse:
+                new = _distances(prev, last[j]) + np.nan_to_num(_distances(first[i], after))
+            else:
+                new = _distances(prev, first[j]) + np.nan_to_num(_distances(last[i], after))
+                # Travel inside the sub-sequence, forwards and backwards
+                fwd = np.concatenate(([0.0], np.cumsum(_distances(last[:-1], first[1:]))))
+                bwd = np.concatenate(([0.0], np.cumsum(_distances(last[1:], first[:-1]))))
+                old = old + fwd[j] - fwd[i]
+                new = new + bwd[j] - bwd[i]
+            gain = old - new
+            best = int(np.argmax(gain))
+            if gain[best] > 1e-9:
+                stop = j[best] + 1
+                order[i:stop] = order[i:stop][::-1]
+                if allow_reverse:
+                    reverse[i:stop] = ~reverse[i:stop][::-1]
+                improved = True
+        if not improved:
+            break
+    return order, reverse
+
+
+def travel_length(entries, exits, start, order, reverse):
+    """
+    Total XY travel (mm) of a job order from `start`.
+    """
+    first, last = _oriented(entries, exits, order, reverse)
+    previous = np.vstack((np.asarray(start, dtype=float)[None], last[:-1]))
+    return float(_distances(previous, first).sum())
+
+
+@stage("plan_travel")
+def plan_travel(layout, R, v, start=None, allow_reverse=None, retract=DEFAULT_RETRACT, hop=DEFAULT_HOP,
+                travel_feed=DEFAULT_TRAVEL_FEED, retract_feed=DEFAULT_RETRACT_FEED, max_passes=50):
+    """
+    Reorder the specimens of a lattice_layout() tuple to cut the travel
+    between them, and join them with real non-extruding moves.
+
+    Each specimen is a job with an entry and an exit point. Jobs are
+    ordered by nearest neighbour from `start` (the first vertex by
+    default) and refined with 2-opt. Jobs may be printed backwards only
+    when `allow_reverse` is set; by default that is the case only when
+    every specimen is a single layer, since reversing a layered specimen
+    would print it top down. Between jobs the ink is retracted by
+    `retract`, the nozzle hops `hop` mm above the tallest specimen, moves
+    with G0 at `travel_feed` and comes down before the ink is pushed back
+    at `retract_feed`. The program ends retracted, lifted to the height
+    of the layout's final lift.
+
+    Returns a Toolpath flagging its G0 vertices in `travel`; its squares
+    follow the new specimen order.
+    """
+    x, y, z, f, lengths, hold, squares = layout
+    # A job runs from the vertex its specimen is entered on to its last
+    # printed vertex; trailing held moves (the final lift) are dropped
+    jobs = []
+    for a, b in zip(squares[:-1], squares[1:]):
+        printed = np.flatnonzero(~hold[a + 1:b])
+        jobs.append(np.arange(a, a + 2 + (printed[-1] if len(printed) else -1)))
+    entries = np.array([(x[job[0]], y[job[0]]) for job in jobs])
+    exits = np.array([(x[job[-1]], y[job[-1]]) for job in jobs])
+    planar = all(np.ptp(z[job]) == 0 for job in jobs)
+    if allow_reverse is None:
+        allow_reverse = planar
+    elif allow_reverse and not planar:
+        raise ValueError("allow_reverse needs single-layer specimens; layered ones would print top down")
+    if start is None:
+        start = (x[0], y[0])
+
+    order, reverse = nearest_neighbour(entries, exits, start, allow_reverse)
+    order, reverse = two_opt(entries, exits, start, order, reverse, allow_reverse, max_passes)
+
+    # Above the tallest printed vertex, not the layout's own travel and lift
+    safe_z = z[np.concatenate(jobs)].max() + hop
+    lift_z = z[-1] if hold[-1] else safe_z
+    px, py, pz, pf, pde, ptravel, offsets = [], [], [], [], [], [], []
+    cx, cy, cz = start[0], start[1], z[jobs[order[0]][0 if not reverse[0] else -1]]
+    count = 0
+
+    def emit(xs, ys, zs, fs, des, is_travel):
+        nonlocal count
+        px.append(xs), py.append(ys), pz.append(zs), pf.append(fs), pde.append(des)
+        ptravel.append(np.full(len(xs), is_travel))
+        count += len(xs)
+
+    for k, (job, backwards) in enumerate(zip(order, reverse)):
+        index = jobs[job]
+        # Increments of the moves between the job's vertices, then oriented
+        de = calculate_extrusion(0.0, lengths[index[1:]], f[index[1:]], R, v)
+        if backwards:
+            index, de = index[::-1], de[::-1]
+        ex, ey, ez = x[index[0]], y[index[0]], z[index[0]]
+        if k:
+            emit([cx], [cy], [cz], [retract_feed], [-retract], False)
+        if k or (cx, cy, cz) != (ex, ey, ez):
+            emit([cx, ex, ex], [cy, ey, ey], [safe_z, safe_z, ez], [travel_feed] * 3, [0.0] * 3, True)
+        offsets.append(count)
+        # The entry vertex pushes the retracted ink back; the layout's own
+        # travel feed only applied to coming down onto it
+        feed = f[index]
+        feed = np.concatenate(([retract_feed if k else feed[1]], feed[1:]))
+        emit(x[index], y[index], z[index], feed, np.concatenate(([retract if k else 0.0], de)), False)
+        cx, cy, cz = x[index[-1]], y[index[-1]], z[index[-1]]
+    emit([cx], [cy], [cz], [retract_feed], [-retract], False)
+    emit([cx], [cy], [lift_z], [travel_feed], [0.0], True)
+
+    E = np.cumsum(np.concatenate(pde))
+    offsets[0] = 0
+    return Toolpath.from_columns(
+        np.concatenate(px), np.concatenate(py), np.concatenate(pz), E, np.concatenate(pf),
+        squares=np.append(offsets, count), travel=np.concatenate(ptravel),
+    )
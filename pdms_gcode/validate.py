@@ -0,0 +1,130 @@
+import argparse
+import sys
+
+import numpy as np
+
+from .reader import read_gcode
+from .rheology import calculate_extrusion_speed, calculate_flow_rate
+from .toolpath import calculate_extrusion
+
+CHECKS = ("e_monotonic", "held_e", "feed", "z_order", "extrusion_per_mm")
+
+# Defaults; E is written with 5 decimals, so two roundings bound its error
+DEFAULT_FEED_RANGE = (1.0, 10000.0)  # mm/min
+DEFAULT_RTOL = 0.02
+DEFAULT_ATOL = 2e-5
+
+
+def validate_toolpath(toolpath, lines=None, R=None, v=None, feed_range=DEFAULT_FEED_RANGE,
+                      rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL, checks=CHECKS):
+    """
+    Consistency checks of a program read back with parse_gcode(), all
+    evaluated on whole columns at once:
+
+    - e_monotonic: E decreases on a move that travels in XY (retractions
+      in place are allowed).
+    - held_e: a G1 move travels in XY without extruding, e.g. a line that
+      repeats the previous E instead of its own.
+    - feed: the feed rate is unset or outside `feed_range`.
+    - z_order: a move extrudes while Z goes down.
+    - extrusion_per_mm: the E increment of an extruding move differs from
+      calculate_extrusion() for its XY length and feed rate by more than
+      `rtol` (plus `atol`). Without `R` and `v` the expected E per mm*F is
+      taken as the median over the program.
+
+    `lines` maps moves to line numbers (moves are numbered from 1 when it
+    is omitted). Returns a list of {"line", "check", "message"} dicts,
+    ordered by line.
+    """
+    x, y, z, e, f = toolpath.data
+    lines = np.arange(1, len(x) + 1) if lines is None else np.asarray(lines)
+    travel = np.zeros(len(x), dtype=bool) if toolpath.travel is None else toolpath.travel
+    L = np.concatenate(([0.0], np.hypot(np.diff(x), np.diff(y))))
+    dE = np.diff(e, prepend=e[:1])
+    dz = np.diff(z, prepend=z[:1])
+    moving = L > 0
+    extruding = dE > atol
+
+    flagged = []
+    if "e_monotonic" in checks:
+        for i in np.flatnonzero(moving & (dE < -atol)):
+            flagged.append((i, "e_monotonic", f"E decreases by {-dE[i]:.5f} on a {L[i]:.3f} mm move"))
+    if "held_e" in checks:
+        for i in np.flatnonzero(moving & ~travel & (np.abs(dE) <= atol)):
+            flagged.append((i, "held_e", f"G1 move of {L[i]:.3f} mm does not extrude (E held at {e[i]:.5f})"))
+    if "feed" in checks:
+        lo, hi = feed_range
+        with np.errstate(invalid="ignore"):
+            bad = np.isnan(f) | (f < lo) | (f > hi)
+        for i in np.flatnonzero(bad):
+            message = "no feed rate set" if np.isnan(f[i]) else f"feed rate {f[i]:g} outside [{lo:g}, {hi:g}] mm/min"
+            flagged.append((i, "feed", message))
+    if "z_order" in checks:
+        for i in np.flatnonzero(extruding & (dz < 0)):
+            flagged.append((i, "z_order", f"extrudes while Z drops by {-dz[i]:g} mm"))
+    if "extrusion_per_mm" in checks:
+        metered = moving & extruding & (f > 0)
+        if R is not None and v is not None:
+            expected = calculate_extrusion(0.0, L, np.where(f > 0, f, 1.0), R, v)
+        elif metered.any():
+            rate = np.median(dE[metered] * f[metered] / L[metered])
+            expected = rate * L / np.where(f > 0, f, 1.0)
+        else:
+            expected = dE
+        bad = metered & (np.abs(dE - expected) > rtol * expected + atol)
+        for i in np.flatnonzero(bad):
+            flagged.append((
+                i, "extrusion_per_mm",
+                f"E increment {dE[i]:.5f} over {L[i]:.3f} mm, expected {expected[i]:.5f} ({dE[i] / expected[i]:.2f}x)",
+            ))
+
+    flagged.sort(key=lambda item: (item[0], CHECKS.index(item[1])))
+    return [{"line": int(lines[i]), "check": check, "message": message} for i, check, message in flagged]
+
+
+def validate_gcode(path, D=None, Gamma=None, n=None, **options):
+    """
+    Read a G-code file and validate it with validate_toolpath(). With the
+    nozzle diameter, shear rate and power-law index the extrusion is
+    checked against the exact calculate_extrusion() values. Returns the
+    number of moves and the issues.
+    """
+    toolpath, lines = read_gcode(path)
+    if D is not None and Gamma is not None and n is not None:
+        R = D / 2
+        options["R"] = R
+        options["v"] = calculate_extrusion_speed(calculate_flow_rate(Gamma, D, n), R)
+    return len(toolpath), validate_toolpath(toolpath, lines, **options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check G-code programs before they reach a printer.")
+    parser.add_argument("files", nargs="+", help="G-code files")
+    parser.add_argument("-D", "--diameter", dest="D", type=float, help="nozzle diameter (mm), for exact E checks")
+    parser.add_argument("--gamma", dest="Gamma", type=float, help="shear rate (1/s), for exact E checks")
+    parser.add_argument("-n", "--power-law-index", dest="n", type=float, help="power-law index, for exact E checks")
+    parser.add_argument("--feed-range", type=float, nargs=2, default=DEFAULT_FEED_RANGE, metavar=("MIN", "MAX"),
+                        help="allowed feed rates (mm/min)")
+    parser.add_argument("--rtol", type=float, default=DEFAULT_RTOL, help="relative tolerance of E per mm")
+    parser.add_argument("--skip", choices=CHECKS, action="append", default=[], help="check to skip (repeatable)")
+    parser.add_argument("--max-issues", type=int, default=20, help="issues listed per file")
+    args = parser.parse_args(argv)
+
+    checks = tuple(check for check in CHECKS if check not in args.skip)
+    failed = False
+    for path in args.files:
+        moves, issues = validate_gcode(
+            path, args.D, args.Gamma, args.n, feed_range=tuple(args.feed_range), rtol=args.rtol, checks=checks
+        )
+        print(f"{path}: {moves} moves, {len(issues)} issues")
+        for issue in issues[:args.max_issues]:
+            print(f"{path}:{issue['line']}: {issue['check']}: {issue['message']}")
+        if len(issues) > args.max_issues:
+            print(f"... {len(issues) - args.max_issues} more")
+        failed = failed or bool(issues)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
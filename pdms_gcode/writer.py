@@ -0,0 +1,134 @@
+import os
+
+import numpy as np
+
+from .profiling import count_bytes, iterate, stage
+from .toolpath import (
+    DEFAULT_PRECISION,
+    collinear_mask,
+    cumulative_extrusion,
+    format_gcode,
+    format_modal,
+    relative_extrusion,
+)
+
+
+def _extruded_blocks(blocks, R, v, relative=False, merge=False, digits=5):
+    """
+    The blocks of stream_gcode() with their E column: X, Y, Z, E, F and
+    travel flags (or None) per block, merged and made relative as asked.
+    """
+    E0 = 0.0
+    last_xy = None
+    printed_E = 0.0
+    for block in blocks:
+        x, y, z, f, lengths, hold = block[:6]
+        travel = block[6] if len(block) > 6 else None
+        if lengths is None:
+            start_x, start_y = last_xy if last_xy is not None else (x[0], y[0])
+            lengths = np.hypot(np.diff(x, prepend=start_x), np.diff(y, prepend=start_y))
+        E = cumulative_extrusion(lengths, f, R, v, E0)
+        E0 = E[-1]
+        E = np.where(hold, E[:-1], E[1:]) if hold is not None else E[1:]
+        last_xy = (x[-1], y[-1])
+        if merge:
+            keep = collinear_mask(x, y, z, E, f)
+            if travel is not None:
+                # Keep both ends of every G0 move
+                keep[travel] = True
+                keep[np.flatnonzero(travel[1:])] = True
+                travel = travel[keep]
+            x, y, z, E, f = x[keep], y[keep], z[keep], E[keep], f[keep]
+        if relative:
+            E, printed_E = relative_extrusion(E, digits, printed_E), E[-1]
+        yield x, y, z, E, f, travel
+
+
+def stream_gcode(blocks, R, v, chunk_lines=4096, modal=False, precision=None, relative=False, merge=False):
+    """
+    Yield the program as text chunks, one block of vertex arrays at a time.
+    `blocks` is any iterable of (x, y, z, f, lengths, hold) tuples such as
+    three_square_blocks(); `lengths` may be None to meter moves by their
+    geometric length, and a seventh array (as lattice_blocks() yields)
+    flags vertices reached by G0 travel. E carries over from block to
+    block, so only one block is ever held in memory. With `modal` the
+    lines are written by format_modal() instead of format_gcode().
+    `relative` switches to M83 per-move E increments and `merge` collapses
+    collinear moves within each block. Building the blocks and their E
+    column is profiled as the "build_blocks" stage.
+    """
+    state = None
+    first = True
+    digits = dict(DEFAULT_PRECISION, **(precision or {}))["E"] if modal else 5
+    if relative:
+        yield "M83"
+        first = False
+    extruded = _extruded_blocks(blocks, R, v, relative, merge, digits)
+    for x, y, z, E, f, travel in iterate("build_blocks", extruded):
+        for i in range(0, len(x), chunk_lines):
+            s = slice(i, i + chunk_lines)
+            t = None if travel is None else travel[s]
+            if modal:
+                text, state = format_modal(x[s], y[s], z[s], E[s], f[s], precision, state, relative, t)
+                if not text:
+                    continue
+            else:
+                text = format_gcode(x[s], y[s], z[s], E[s], f[s], t)
+            yield text if first else "\n" + text
+            first = False
+
+
+@stage("write_gcode")
+def write_gcode(chunks, dest, buffer_size=1 << 16):
+    """
+    Write text chunks to a file path or any writable text stream as they
+    are produced. Returns the number of characters written.
+    """
+    if isinstance(dest, (str, os.PathLike)):
+        with open(dest, "w", buffering=buffer_size) as f:
+            return _write_chunks(chunks, f)
+    return _write_chunks(chunks, dest)
+
+
+def _write_chunks(chunks, dest):
+    written = 0
+    for chunk in chunks:
+        dest.write(chunk)
+        written += len(chunk)
+    count_bytes(written)
+    return written
+
+
+@stage("build_blocks")
+def _prepared_toolpath(toolpath, relative, merge, digits):
+    if merge:
+        toolpath = toolpath.merged()
+    E = relative_extrusion(toolpath.e, digits) if relative else toolpath.e
+    return toolpath, E
+
+
+def stream_toolpath(toolpath, chunk_lines=4096, modal=False, precision=None, relative=False, merge=False):
+    """
+    Yield an assembled Toolpath as text chunks, with the same options and
+    output as stream_gcode(). G0 travel flagged on the toolpath is kept.
+    """
+    digits = dict(DEFAULT_PRECISION, **(precision or {}))["E"] if modal else 5
+    toolpath, E = _prepared_toolpath(toolpath, relative, merge, digits)
+    x, y, z, _, f = toolpath.data
+    travel = toolpath.travel
+    first = True
+    state = None
+    if relative:
+        yield "M83"
+        first = False
+    for i in range(0, len(x), chunk_lines):
+        s = slice(i, i + chunk_lines)
+        t = None if travel is None else travel[s]
+        if modal:
+            text, state = format_modal(x[s], y[s], z[s], E[s], f[s], precision, state, relative, t)
+            if not text:
+                continue
+        else:
+            text = format_gcode(x[s], y[s], z[s], E[s], f[s], t)
+        yield text if first else "\n" + text
+        first = False
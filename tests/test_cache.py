@@ -0,0 +1,36 @@
+import os
+
+from pdms_gcode.cache import cached_program, entry_dir, evict, program_key
+from pdms_gcode.cli import main
+
+PARAMS = dict(deltax=2.0, deltay=1.5, u1=600.0, u2=900.0, u3=1200.0, D=0.41, Gamma=50.0, n=0.4)
+
+
+def _entries(cache_dir):
+    return sorted(
+        entry.name for shard in os.scandir(cache_dir) if shard.is_dir() for entry in os.scandir(shard.path)
+    )
+
+
+def test_cli_cache_is_trimmed_after_misses(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    entry = cached_program(PARAMS, cache_dir)
+    size = sum(f.stat().st_size for f in os.scandir(entry["dir"]))
+    for u1 in (300, 400, 500, 600, 700):
+        main(["--deltax", "2", "--deltay", "1.5", "--u1", str(u1), "--u2", "900", "--u3", "1200", "-D", "0.41",
+              "--gamma", "50", "-n", "0.4", "-q", "-o", str(tmp_path / "out.gcode"),
+              "--cache", cache_dir, "--cache-size", str(2.5 * size / 2 ** 20)])
+    # Two entries fit; the most recently used ones are kept
+    assert len(_entries(cache_dir)) == 2
+    assert program_key(dict(PARAMS, u1=700.0))[2:] in _entries(cache_dir)
+
+
+def test_evict_skips_entries_being_written(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    entry = cached_program(PARAMS, cache_dir)
+    tmp = f"{entry_dir(program_key(dict(PARAMS, u1=1.0)), cache_dir)}.123.tmp"
+    os.makedirs(tmp)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        f.write("{}")
+    evict(cache_dir, 0)
+    assert os.path.isdir(tmp) and not os.path.exists(entry["dir"])
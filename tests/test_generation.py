@@ -0,0 +1,56 @@
+import json
+import os
+import re
+
+import numpy as np
+import pytest
+
+from pdms_gcode import IncrementalProgram, calculate_extrusion_speed, calculate_flow_rate, generate_gcode
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+# Output of the original PDMS_G_code_final.py for two sets of inputs
+with open(os.path.join(DATA, "baseline_programs.json")) as f:
+    BASELINE = json.load(f)
+
+WORD = re.compile(r"([XYZEF])(-?[\d.]+)")
+
+
+def _rheology(params):
+    R = params["D"] / 2
+    return R, calculate_extrusion_speed(calculate_flow_rate(params["Gamma"], params["D"], params["n"]), R)
+
+
+@pytest.mark.parametrize("case", BASELINE, ids=lambda case: "deltax={deltax}".format(**case["params"]))
+def test_three_square_matches_original(case):
+    p = case["params"]
+    R, v = _rheology(p)
+    gcode, coords = generate_gcode(p["deltax"], p["deltay"], p["u1"], p["u2"], p["u3"], R, v)
+    lines, expected = gcode.splitlines(), case["gcode"].splitlines()
+    assert len(lines) == len(expected) == 90
+    for line, old in zip(lines, expected):
+        words, old_words = WORD.findall(line), WORD.findall(old)
+        assert [k for k, _ in words] == [k for k, _ in old_words]
+        for (letter, value), (_, old_value) in zip(words, old_words):
+            if letter == "E":
+                # E is compared as printed, to the last decimal
+                assert value == old_value, (line, old)
+            else:
+                assert float(value) == pytest.approx(float(old_value), abs=1e-9), (line, old)
+    np.testing.assert_allclose(coords, case["coords"], atol=1e-9)
+
+
+def test_incremental_matches_full_regeneration():
+    rng = np.random.default_rng(0)
+    p = BASELINE[0]["params"]
+    R, v = _rheology(p)
+    params = dict(deltax=p["deltax"], deltay=p["deltay"], u1=p["u1"], u2=p["u2"], u3=p["u3"], R=R, v=v)
+    program = IncrementalProgram(**params)
+    for _ in range(500):
+        # Mostly speed changes, which take the shifting path
+        names = rng.choice(["u1", "u2", "u3", "u1", "u2", "u3", "deltax", "deltay", "R", "v"],
+                           size=rng.integers(1, 3), replace=False)
+        changes = {name: params[name] * rng.uniform(0.5, 1.5) for name in names}
+        params.update(changes)
+        program.update(**changes)
+        assert program.gcode() == generate_gcode(**params)[0]
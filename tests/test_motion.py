@@ -0,0 +1,45 @@
+import math
+
+import numpy as np
+import pytest
+
+from pdms_gcode import calculate_extrusion_speed, calculate_flow_rate, generate_toolpath
+from pdms_gcode.motion import estimate_print, estimate_sweep, plan_segments
+
+
+@pytest.mark.parametrize("length", [100.0, 4.0])
+def test_single_move_is_a_trapezoid(length):
+    a, feed = 500.0, 6000.0
+    t, v_in, v_out = plan_segments(np.array([0.0, length]), np.zeros(2), np.zeros(2), np.full(2, feed), acceleration=a)
+    v = feed / 60.0
+    if v * v / a <= length:
+        # Accelerate to v, cruise, decelerate
+        expected = 2 * v / a + (length - v * v / a) / v
+    else:
+        # Triangle: peak speed where the ramps meet
+        expected = 2 * math.sqrt(a * length) / a
+    assert t[0] == pytest.approx(expected)
+    assert v_in[0] == v_out[0] == 0.0
+
+
+def test_collinear_moves_take_as_long_as_one():
+    f = np.full(3, 3000.0)
+    split, _, _ = plan_segments(np.array([0.0, 7.0, 30.0]), np.array([0.0, 7.0, 30.0]), np.zeros(3), f)
+    whole, _, _ = plan_segments(np.array([0.0, 30.0]), np.array([0.0, 30.0]), np.zeros(2), f[:2])
+    assert split.sum() == pytest.approx(whole.sum())
+
+
+def test_sweep_matches_single_estimates():
+    grid = [
+        dict(deltax=2.0, deltay=1.5, u1=600.0, u2=900.0, u3=1200.0, D=0.41, Gamma=50.0, n=0.4),
+        dict(deltax=1.25, deltay=0.8, u1=300.0, u2=450.0, u3=1500.0, D=0.6, Gamma=120.0, n=0.7),
+        dict(deltax=3.0, deltay=2.0, u1=2400.0, u2=150.0, u3=900.0, D=0.25, Gamma=10.0, n=0.9),
+    ]
+    for params, result in zip(grid, estimate_sweep(grid)):
+        R = params["D"] / 2
+        Q = calculate_flow_rate(params["Gamma"], params["D"], params["n"])
+        toolpath = generate_toolpath(params["deltax"], params["deltay"], params["u1"], params["u2"], params["u3"],
+                                     R, calculate_extrusion_speed(Q, R))
+        single = estimate_print(toolpath, Q)
+        for key in ("time", "naive_time", "extruded_volume"):
+            assert result[key] == pytest.approx(single[key], rel=1e-12), key
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from pdms_gcode import generate_lattice
+from pdms_gcode.preview import MAX_VECTOR_SEGMENTS, rasterize_segments, render_preview
+
+
+def test_rasterize_segments():
+    segments = np.array([[[0.5, 0.5], [9.5, 0.5]], [[2.5, 0.5], [2.5, 9.5]]])
+    colors = np.array([[1.0, 0.0, 0.0, 1.0], [0.0, 0.0, 1.0, 1.0]])
+    image = rasterize_segments(segments, colors, 10, 10, (0.0, 10.0, 0.0, 10.0))
+    # Row 0 is the bottom; the second segment is painted over the first
+    np.testing.assert_array_equal(image[0, :, 0], [255, 255, 0, 255, 255, 255, 255, 255, 255, 255])
+    np.testing.assert_array_equal(image[:, 2, 2], np.full(10, 255))
+    assert image[1:, [0, 1, 3]].sum() == 0
+
+
+def test_dense_preview_is_rasterized(tmp_path):
+    pytest.importorskip("matplotlib")
+    toolpath = generate_lattice(2.0, 1.5, [600.0, 900.0, 1200.0], 0.205, 1.2, specimens=4000, columns=60)
+    path = tmp_path / "bed.svg"
+    assert render_preview(toolpath.x, toolpath.y, str(path), z=toolpath.z) > MAX_VECTOR_SEGMENTS
+    svg = path.read_text()
+    assert "<image" in svg and svg.count("<path") < 1000
@@ -0,0 +1,27 @@
+import os
+
+from pdms_gcode import lattice_blocks, stream_gcode, write_gcode
+from pdms_gcode.cache import cached_program, export, program_path
+from pdms_gcode.profiling import profiled
+
+PARAMS = dict(deltax=2.0, deltay=1.5, u1=600.0, u2=900.0, u3=1200.0, D=0.41, Gamma=50.0, n=0.4)
+
+
+def test_block_building_is_its_own_stage(tmp_path):
+    blocks = lattice_blocks(2.0, 1.5, [600.0, 900.0], specimens=5)
+    with profiled() as profiler:
+        written = write_gcode(stream_gcode(blocks, 0.205, 1.2), str(tmp_path / "bed.gcode"))
+    stages = profiler.report()["stages"]
+    # One call per block, plus the one that finds the blocks exhausted
+    assert stages["build_blocks"]["calls"] == 6
+    assert stages["write_gcode"]["bytes"] == written
+    assert stages["write_gcode"]["self_time"] < stages["write_gcode"]["time"]
+
+
+def test_cache_writes_are_counted(tmp_path):
+    with profiled() as profiler:
+        entry = cached_program(PARAMS, str(tmp_path / "cache"))
+        export(program_path(entry), str(tmp_path / "program.gcode"))
+    stages = profiler.report()["stages"]
+    assert stages["cache_store"]["bytes"] == sum(entry.stat().st_size for entry in os.scandir(entry["dir"]))
+    assert stages["cache_export"]["bytes"] == os.path.getsize(tmp_path / "program.gcode")
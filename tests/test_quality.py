@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("scipy")
+Image = pytest.importorskip("PIL.Image")
+
+from pdms_gcode.quality import pore_metrics, score_image  # noqa: E402
+from pdms_gcode.raster import reference_mask  # noqa: E402
+
+
+def test_enclosed_pore():
+    mask = np.ones((6, 6), dtype=bool)
+    mask[2:4, 2:4] = False
+    area, perimeter, pr = pore_metrics(mask)
+    np.testing.assert_array_equal(area, [4])
+    np.testing.assert_array_equal(perimeter, [8])
+    np.testing.assert_allclose(pr, [1.0])
+
+
+def test_reference_print_has_finite_pore_metrics(tmp_path):
+    deltax, deltay, D, ppm = 2.0, 1.5, 0.41, 40
+    mask = reference_mask(deltax, deltay, D, ppm, cache_dir=None)
+    path = str(tmp_path / "reference.png")
+    Image.fromarray(np.where(mask, 0, 255).astype(np.uint8)).save(path)
+    scores = score_image(path, pixels_per_mm=ppm, deltax=deltax)
+    assert len(scores) == 3
+    for score in scores:
+        # The channels between strands, about (deltax - D) by (deltay - D)
+        assert score["pore_count"] >= 13
+        assert score["pore_area_mean"] == pytest.approx((deltax - D) * (deltay - D), rel=0.15)
+        assert np.isfinite(score["printability_index"])
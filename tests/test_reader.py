@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from pdms_gcode import generate_lattice, generate_toolpath, lattice_layout, parse_gcode, plan_travel, stream_toolpath
+
+R, V = 0.205, 1.2
+
+MODES = {
+    "full": {},
+    "modal": dict(modal=True),
+    "relative": dict(relative=True),
+    "modal-relative": dict(modal=True, relative=True),
+    "merge": dict(merge=True),
+    "modal-merge": dict(modal=True, merge=True),
+}
+
+
+def _programs():
+    return {
+        "three-square": generate_toolpath(2.0, 1.5, 600.0, 900.0, 1200.0, R, V),
+        "lattice": generate_lattice(2.0, 1.5, [600.0, 900.0, 1200.0], R, V, specimens=7, columns=3),
+        "travel": plan_travel(lattice_layout(2.0, 1.5, [600.0, 900.0], specimens=5, columns=2), R, V),
+    }
+
+
+@pytest.mark.parametrize("program", ["three-square", "lattice", "travel"])
+@pytest.mark.parametrize("mode", list(MODES))
+def test_writer_modes_read_back(program, mode):
+    toolpath = _programs()[program]
+    options = MODES[mode]
+    text = "".join(stream_toolpath(toolpath, chunk_lines=17, **options))
+    parsed, _ = parse_gcode(text)
+    expected = toolpath.merged() if options.get("merge") else toolpath
+    assert len(parsed) == len(expected)
+    # Modal output rounds XYZ to 3 decimals and F to whole numbers
+    for column, tol in (("x", 1e-3), ("y", 1e-3), ("z", 1e-3), ("f", 0.5)):
+        np.testing.assert_allclose(getattr(parsed, column), getattr(expected, column), atol=tol, err_msg=column)
+    # Relative increments are rounded so that their sum tracks the absolute E
+    np.testing.assert_allclose(parsed.e, expected.e, atol=1e-5)
+    if expected.travel is None:
+        assert parsed.travel is None or not parsed.travel.any()
+    else:
+        np.testing.assert_array_equal(parsed.travel, expected.travel)
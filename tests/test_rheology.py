@@ -0,0 +1,39 @@
+import math
+
+import numpy as np
+import pytest
+
+from pdms_gcode.rheology import (MATERIALS, calculate_flow_rate, carreau_flow_rate, flow_rate, flow_rate_table,
+                                 herschel_bulkley_flow_rate, material_flow_rate, register_material)
+
+GAMMA = np.array([0.5, 10.0, 50.0, 800.0])
+
+
+@pytest.fixture
+def material():
+    register_material("test ink", "herschel_bulkley", n=0.45, K=120.0, tau_y=35.0)
+    yield "test ink"
+    MATERIALS.pop("test ink")
+    flow_rate_table.cache_clear()
+
+
+def test_herschel_bulkley_without_yield_stress_is_power_law():
+    for n in (0.3, 0.6, 1.0):
+        Q = herschel_bulkley_flow_rate(GAMMA, 0.41, n, K=80.0, tau_y=0.0)
+        assert np.allclose(Q, calculate_flow_rate(GAMMA, 0.41, n), rtol=1e-12)
+
+
+def test_carreau_with_unit_index_is_newtonian():
+    D = 0.41
+    Q = carreau_flow_rate(GAMMA, D, 1.0, eta0=50.0, eta_inf=0.5, lam=2.0)
+    assert np.allclose(Q, math.pi * (D / 2) ** 3 * GAMMA / 4 * 60, rtol=1e-12)
+
+
+def test_material_flow_rate_follows_its_model(material):
+    model, params = MATERIALS[material]
+    inside = np.array([0.1, 3.0, 250.0, 5000.0])
+    assert np.allclose(material_flow_rate(material, inside, 0.41), flow_rate(model, inside, 0.41, **params),
+                       rtol=1e-4)
+    outside = np.array([1e-4, 1e6])
+    assert np.allclose(material_flow_rate(material, outside, 0.41), flow_rate(model, outside, 0.41, **params),
+                       rtol=1e-12)
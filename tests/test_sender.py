@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from pdms_gcode import generate_toolpath
+from pdms_gcode.sender import VirtualPrinter, program_lines, send_to_port
+
+LINES = program_lines(generate_toolpath(2.0, 1.5, 600.0, 900.0, 1200.0, 0.205, 1.2).gcode())
+
+
+def _send(lines, mode, **options):
+    async def run():
+        window = options.get("window") if mode == "window" else None
+        async with VirtualPrinter(options.get("rx_size", 127), window=window) as printer:
+            report = await send_to_port(lines, printer.port, None, mode=mode, **options)
+            await printer.finish()
+        return report, printer
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("mode, options", [
+    ("count", dict(rx_size=127)),
+    ("count", dict(rx_size=64)),
+    ("window", dict(window=4)),
+])
+def test_program_arrives_intact(mode, options):
+    report, printer = _send(LINES, mode, **options)
+    assert printer.received == LINES
+    assert printer.overflows == 0
+    assert report["commands"] == len(LINES) and report["errors"] == []
+    assert printer.executed == len(LINES)
+
+
+def test_window_of_one_starves_after_every_command():
+    report, printer = _send(LINES, "window", window=1)
+    assert printer.received == LINES
+    assert printer.overflows == 0
+    # Each command waits for the previous "ok" with nothing else in flight
+    assert report["starved"] == len(LINES) - 1
+    assert report["max_in_flight"] == 1
+
+
+def test_count_mode_keeps_the_buffer_full():
+    report, _ = _send(LINES, "count", rx_size=127)
+    assert report["starved"] == 0
+    assert report["max_in_flight"] > 1
@@ -0,0 +1,21 @@
+import json
+
+import pytest
+
+from pdms_gcode.server import HTTPError, parse_request_params
+
+PARAMS = dict(deltax=2, deltay=1.5, u1=600, u2=900, u3=1200, D=0.41, Gamma=50, n=0.4)
+
+
+def test_parse_request_params():
+    params, color_by = parse_request_params(json.dumps(dict(PARAMS, color_by="feed")).encode())
+    assert params == {name: float(value) for name, value in PARAMS.items()}
+    assert color_by == "feed"
+
+
+@pytest.mark.parametrize("name", list(PARAMS))
+@pytest.mark.parametrize("value", [0, -1.0, "nan", None])
+def test_parse_request_params_rejects_invalid_values(name, value):
+    with pytest.raises(HTTPError) as error:
+        parse_request_params(json.dumps(dict(PARAMS, **{name: value})).encode())
+    assert error.value.status == 400
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from pdms_gcode import (
+    generate_lattice,
+    lattice_blocks,
+    lattice_layout,
+    parse_gcode,
+    plan_travel,
+    stream_gcode,
+    stream_toolpath,
+)
+from pdms_gcode.cli import main
+from pdms_gcode.validate import validate_toolpath
+
+R, V = 0.205, 1.2
+
+
+def _ploughs(toolpath, samples=64):
+    """
+    Non-extruding moves passing over a specimen footprint (its XY
+    bounding box) that is already printed, below the specimen's top Z.
+    """
+    x, y, z, e = toolpath.x, toolpath.y, toolpath.z, toolpath.e
+    extruding = np.flatnonzero(np.diff(e) > 0) + 1
+    footprints = []
+    for a, b in zip(toolpath.squares[:-1], toolpath.squares[1:]):
+        moves = extruding[(extruding > a) & (extruding < b)]
+        printed = np.union1d(moves, moves - 1)
+        footprints.append((printed[-1], x[printed].min(), x[printed].max(), y[printed].min(), y[printed].max(),
+                           z[printed].max()))
+    t = np.linspace(0.0, 1.0, samples)
+    bad = []
+    for i in np.setdiff1d(np.arange(1, len(x)), extruding):
+        px, py, pz = (c[i - 1] + t * (c[i] - c[i - 1]) for c in (x, y, z))
+        for last, x0, x1, y0, y1, top in footprints:
+            if last > i - 1:
+                continue
+            over = (px >= x0 - 1e-9) & (px <= x1 + 1e-9) & (py >= y0 - 1e-9) & (py <= y1 + 1e-9)
+            if (over & (pz < top - 1e-9)).any():
+                bad.append(i)
+    return bad
+
+
+@pytest.mark.parametrize("columns", [None, 1, 3])
+def test_lattice_travel_clears_printed_specimens(columns):
+    toolpath = generate_lattice(2.0, 1.5, [600.0, 900.0, 1200.0], R, V, specimens=7, columns=columns)
+    assert _ploughs(toolpath) == []
+
+
+@pytest.mark.parametrize("columns", [1, 3])
+def test_planned_travel_clears_printed_specimens(columns):
+    layout = lattice_layout(2.0, 1.5, [600.0, 900.0, 1200.0], specimens=7, columns=columns)
+    assert _ploughs(plan_travel(layout, R, V)) == []
+
+
+@pytest.mark.parametrize("specimens, columns", [(1, None), (7, 3), (10, None)])
+def test_lattice_blocks_match_layout(specimens, columns):
+    options = dict(specimens=specimens, columns=columns, layers=4, hop=3.0, lift=25.0)
+    x, y, z, f, lengths, hold, squares = lattice_layout(2.0, 1.5, [600.0, 900.0, 1200.0], **options)
+    blocks = list(lattice_blocks(2.0, 1.5, [600.0, 900.0, 1200.0], **options))
+    assert [len(block[0]) for block in blocks] == np.diff(squares).tolist()
+    for column, expected in zip(zip(*blocks), (x, y, z, f, lengths, hold, hold)):
+        np.testing.assert_array_equal(np.concatenate(column), expected)
+
+
+def test_planned_travel_hops_above_specimens_only():
+    layout = lattice_layout(2.0, 1.5, [600.0, 900.0, 1200.0], specimens=7, columns=3, layers=3, layer_height=2.0,
+                            lift=30.0)
+    toolpath = plan_travel(layout, R, V, hop=2.0)
+    hops = toolpath.z[toolpath.travel][:-1]
+    # Top layer at Z4, so travel runs at Z6 and only the final move lifts to Z30
+    assert hops.max() == pytest.approx(6.0)
+    assert toolpath.z[-1] == pytest.approx(30.0)
+
+
+@pytest.mark.parametrize("options", [{}, dict(modal=True), dict(relative=True, merge=True)])
+def test_default_bed_validates(options):
+    blocks = lattice_blocks(2.0, 1.5, [300.0, 600.0, 900.0], specimens=6, columns=3)
+    toolpath, lines = parse_gcode("".join(stream_gcode(blocks, R, V, **options)))
+    assert toolpath.travel.sum() == 5 * 3 + 1
+    assert validate_toolpath(toolpath, lines, R=R, v=V) == []
+
+
+def test_lattice_travel_is_written_as_g0():
+    toolpath = generate_lattice(2.0, 1.5, [300.0, 600.0], R, V, specimens=3, travel_feed=2400.0)
+    text = "".join(stream_toolpath(toolpath))
+    travel = [line for line in text.splitlines() if line.startswith("G0")]
+    assert len(travel) == 2 * 3 + 1 and all(line.endswith("F2400.0") for line in travel)
+    assert text == "".join(stream_gcode(lattice_blocks(2.0, 1.5, [300.0, 600.0], specimens=3, travel_feed=2400.0),
+                                        R, V))
+
+
+@pytest.mark.parametrize("counts", [dict(specimens=0), dict(columns=0), dict(specimens=-2, columns=3)])
+def test_empty_beds_are_rejected(counts):
+    with pytest.raises(ValueError):
+        lattice_layout(2.0, 1.5, [600.0], **counts)
+    with pytest.raises(ValueError):
+        lattice_blocks(2.0, 1.5, [600.0], **counts)
+
+
+@pytest.mark.parametrize("option", ["--specimens", "--columns"])
+def test_cli_rejects_empty_beds(option, tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        main(["--deltax", "2", "--deltay", "1.5", "-D", "0.41", "--gamma", "50", "-n", "0.4",
+              "--speeds", "600", option, "0", "-o", str(tmp_path / "bed.gcode")])
+    assert f"{option} must be at least 1" in capsys.readouterr().err
+    assert not (tmp_path / "bed.gcode").exists()